@@ -1,17 +1,53 @@
-﻿from fastapi import FastAPI, Request
-from fastapi.responses import HTMLResponse, RedirectResponse
+﻿from fastapi import FastAPI, Request, Depends
+from fastapi.responses import HTMLResponse, RedirectResponse, Response
+from fastapi.concurrency import run_in_threadpool
 from fastapi.templating import Jinja2Templates
+from jinja2 import Environment, FileSystemLoader, FileSystemBytecodeCache
 from pydantic import BaseModel
+import html
 import os
+import threading
+import time
 from datetime import datetime
+from functools import lru_cache
+from typing import Optional, Tuple
 from src.services.report_service import ReportService
 from src.services.config_manager import ConfigManager
 from src.services.logger_config import setup_logging
 
 app = FastAPI(title="Release Report API", version="1.0.0")
 
-# Настройка шаблонов
-templates = Jinja2Templates(directory="templates")
+# Настройка шаблонов: в production шаблоны не перепроверяются на диске,
+# скомпилированные шаблоны хранятся в памяти без ограничения и в файловом кэше байткода
+templates = Jinja2Templates(env=Environment(
+    loader=FileSystemLoader("templates"),
+    autoescape=True,
+    auto_reload=os.getenv("ENV") != "production",
+    cache_size=-1,
+    bytecode_cache=FileSystemBytecodeCache()
+))
+
+# Страница ошибки предпросмотра, заранее закодированная в байты; между частями вставляется текст ошибки
+_ERROR_PAGE_PREFIX = """
+        <!DOCTYPE html>
+        <html lang="ru">
+        <head>
+            <meta charset="UTF-8">
+            <title>Ошибка формирования отчета</title>
+            <style>
+                body { font-family: Arial, sans-serif; padding: 20px; background: #f5f5f5; }
+                .error { background: #f8d7da; color: #721c24; padding: 20px; border-radius: 5px; border: 1px solid #f5c6cb; }
+            </style>
+        </head>
+        <body>
+            <div class="error">
+                <h2>Ошибка при формировании отчета</h2>
+                <p>""".encode("utf-8")
+_ERROR_PAGE_SUFFIX = """</p>
+            </div>
+        </body>
+        </html>
+        """.encode("utf-8")
 
 # Модели данных
 class UpdateDateRequest(BaseModel):
@@ -20,24 +56,70 @@ class UpdateDateRequest(BaseModel):
 class GenerateReportRequest(BaseModel):
     report_date: str = None
 
-def get_services():
-    # Настраиваем логирование
+@lru_cache(maxsize=1)
+def get_config_manager() -> ConfigManager:
+    """Возвращает общий менеджер конфигурации (создается один раз на процесс)"""
+    return ConfigManager()
+
+# Время жизни кэшированного ответа /multi-tracker-status, секунд
+TRACKER_STATUS_TTL = 5.0
+_tracker_status_cache: Optional[Tuple[float, dict]] = None
+
+# Синхронные обработчики выполняются в пуле потоков FastAPI: проверка и перезагрузка конфигурации,
+# сброс и создание общих сервисов выполняются под одной блокировкой
+_services_lock = threading.RLock()
+
+@lru_cache(maxsize=1)
+def _create_report_service(config_manager: ConfigManager) -> ReportService:
+    """Создает сервис отчетов для указанного менеджера конфигурации"""
+    return ReportService(config_manager)
+
+def _reset_services() -> None:
+    """Сбрасывает сервисы и ответы, построенные по текущей конфигурации"""
+    global _tracker_status_cache
+    _create_report_service.cache_clear()
+    _tracker_status_cache = None
+
+def _refresh_config(config_manager: ConfigManager) -> None:
+    """Перезагружает конфигурацию, если файлы изменились, и сбрасывает созданные по ней сервисы"""
+    with _services_lock:
+        # Проверяем только mtime/size файлов, без чтения и разбора
+        if config_manager.is_stale():
+            # Сбрасываем сервисы до перезагрузки: при ошибке они пересоздадутся и сообщат о ней
+            _reset_services()
+            config_manager.reload_config()
+
+def get_report_service(config_manager: ConfigManager) -> ReportService:
+    """Возвращает общий сервис отчетов, пересоздавая его при изменении файлов конфигурации"""
+    with _services_lock:
+        _refresh_config(config_manager)
+        return _create_report_service(config_manager)
+
+@app.on_event("startup")
+def init_services():
+    """Настраивает логирование и заранее создает сервисы"""
     setup_logging()
-    
-    # Создаем менеджер конфигурации
-    config_manager = ConfigManager()
-    
-    # Создаем сервис отчетов
-    report_service = ReportService(config_manager)
-    return report_service
+    try:
+        get_report_service(get_config_manager())
+    except Exception as e:
+        # Сервисы будут созданы при первом запросе
+        print(f"Ошибка инициализации сервисов: {e}")
 
-@app.get("/", response_class=HTMLResponse)
-async def root(request: Request):
-    """Главная страница с кнопкой для генерации отчета"""
-    # Читаем актуальную дату из файла commits
+# Отформатированная дата из файла commits: ((mtime, size), дата)
+_commits_date_cache: Optional[Tuple[Tuple[int, int], str]] = None
+
+def _read_current_date() -> str:
+    """Читает актуальную дату из файла commits"""
+    global _commits_date_cache
     current_date = "Не определена"
     try:
         if os.path.exists("commits"):
+            # Файл меняется редко: повторно читаем и разбираем его только после изменения
+            stat = os.stat("commits")
+            file_key = (stat.st_mtime_ns, stat.st_size)
+            if _commits_date_cache and _commits_date_cache[0] == file_key:
+                return _commits_date_cache[1]
+            
             with open("commits", "r", encoding="utf-8") as f:
                 commit_data = f.read().strip()
                 if commit_data:
@@ -47,19 +129,85 @@ async def root(request: Request):
                         current_date = dt.strftime("%d.%m.%Y %H:%M:%S")
                     except:
                         current_date = commit_data
+            
+            _commits_date_cache = (file_key, current_date)
     except Exception as e:
         print(f"Ошибка чтения файла commits: {e}")
+    return current_date
+
+def _is_commit_date_format(value: str) -> bool:
+    """Быстро проверяет, что строка имеет вид YYYY-MM-DDTHH:MM или YYYY-MM-DDTHH:MM:SS"""
+    return (
+        len(value) in (16, 19)
+        and value[4] == '-' and value[7] == '-' and value[10] == 'T' and value[13] == ':'
+        and (len(value) == 16 or value[16] == ':')
+    )
+
+def _write_commit_date(iso_date: str) -> None:
+    """Записывает дату в файл commits"""
+    with open("commits", "w", encoding="utf-8") as f:
+        f.write(iso_date)
+
+def _save_config_files(config_manager: ConfigManager, config_data: dict) -> None:
+    """Создает резервную копию и сохраняет разделы конфигурации в файлы"""
+    # Создаем резервную копию
+    config_manager.backup_config()
     
-    return templates.TemplateResponse("index.html", {
+    # Сохраняем переданные разделы одной атомарной записью, без повторного чтения файлов
+    sections = {
+        section: config_data[section]
+        for section in ('app', 'gitlab', 'confluence', 'trackers')
+        if section in config_data
+    }
+    if sections:
+        config_manager.save_config_sections(sections)
+
+def _files_etag(*paths: str) -> str:
+    """Строит ETag по mtime/size файлов, от которых зависит страница"""
+    parts = []
+    for path in paths:
+        try:
+            stat = os.stat(path)
+            parts.append(f"{stat.st_mtime_ns:x}-{stat.st_size:x}")
+        except OSError:
+            parts.append("0")
+    return '"' + ".".join(parts) + '"'
+
+def _not_modified(request: Request, etag: str) -> Optional[Response]:
+    """Возвращает ответ 304, если у клиента актуальная версия страницы"""
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers={"ETag": etag, "Cache-Control": "no-cache"})
+    return None
+
+# Обработчики без реальной асинхронной работы объявлены обычными функциями:
+# FastAPI выполняет их в пуле потоков, и файловые операции не блокируют цикл событий
+
+@app.get("/", response_class=HTMLResponse)
+def root(request: Request):
+    """Главная страница с кнопкой для генерации отчета"""
+    # Страница меняется только вместе с файлом commits или шаблоном
+    etag = _files_etag("commits", "templates/index.html")
+    not_modified = _not_modified(request, etag)
+    if not_modified:
+        return not_modified
+    
+    current_date = _read_current_date()
+    
+    response = templates.TemplateResponse("index.html", {
         "request": request,
         "current_date": current_date
     })
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = "no-cache"
+    return response
 
 @app.post("/generate-report")
-async def generate_report(request: GenerateReportRequest = None):
+async def generate_report(request: GenerateReportRequest = None, config_manager: ConfigManager = Depends(get_config_manager)):
     """Генерирует отчет по коммитам и создает страницу в Confluence"""
     try:
-        report_service = get_services()
+        # Проверка конфигурации и создание сервисов берут общую блокировку и обращаются к диску,
+        # поэтому выполняются в пуле потоков, а не в цикле событий
+        report_service = await run_in_threadpool(get_report_service, config_manager)
         
         # Если передана дата формирования отчета, используем её
         if request and request.report_date:
@@ -77,10 +225,12 @@ async def generate_report(request: GenerateReportRequest = None):
         return {"status": "error", "message": str(e)}
 
 @app.get("/preview-report", response_class=HTMLResponse)
-async def preview_report(report_date: str = None):
+async def preview_report(report_date: str = None, config_manager: ConfigManager = Depends(get_config_manager)):
     """Генерирует предварительный просмотр отчета без сохранения в Confluence"""
     try:
-        report_service = get_services()
+        # Проверка конфигурации и создание сервисов берут общую блокировку и обращаются к диску,
+        # поэтому выполняются в пуле потоков, а не в цикле событий
+        report_service = await run_in_threadpool(get_report_service, config_manager)
         
         # Если передана дата формирования отчета, используем её
         if report_date:
@@ -91,32 +241,14 @@ async def preview_report(report_date: str = None):
         # Возвращаем HTML страницу с отчетом
         return HTMLResponse(content=result, status_code=200)
     except Exception as e:
-        error_html = f"""
-        <!DOCTYPE html>
-        <html lang="ru">
-        <head>
-            <meta charset="UTF-8">
-            <title>Ошибка формирования отчета</title>
-            <style>
-                body {{ font-family: Arial, sans-serif; padding: 20px; background: #f5f5f5; }}
-                .error {{ background: #f8d7da; color: #721c24; padding: 20px; border-radius: 5px; border: 1px solid #f5c6cb; }}
-            </style>
-        </head>
-        <body>
-            <div class="error">
-                <h2>Ошибка при формировании отчета</h2>
-                <p>{str(e)}</p>
-            </div>
-        </body>
-        </html>
-        """
-        return HTMLResponse(content=error_html, status_code=500)
+        error_html = _ERROR_PAGE_PREFIX + html.escape(str(e)).encode("utf-8") + _ERROR_PAGE_SUFFIX
+        return Response(content=error_html, status_code=500, media_type="text/html; charset=utf-8")
 
 @app.get("/task-tracker-info")
-async def get_task_tracker_info():
+def get_task_tracker_info(config_manager: ConfigManager = Depends(get_config_manager)):
     """Возвращает информацию о текущих таск-трекерах"""
     try:
-        report_service = get_services()
+        report_service = get_report_service(config_manager)
         info = report_service.get_task_tracker_info()
         return {
             "status": "success",
@@ -126,41 +258,60 @@ async def get_task_tracker_info():
         return {"status": "error", "message": str(e)}
 
 @app.get("/multi-tracker-status")
-async def get_multi_tracker_status():
+def get_multi_tracker_status(config_manager: ConfigManager = Depends(get_config_manager)):
     """Возвращает детальную информацию о множественных трекерах"""
+    global _tracker_status_cache
     try:
-        report_service = get_services()
+        report_service = get_report_service(config_manager)
+        
+        # Отдаем недавний ответ, не опрашивая сервисы трекеров повторно
+        now = time.monotonic()
+        if _tracker_status_cache and now - _tracker_status_cache[0] < TRACKER_STATUS_TTL:
+            return _tracker_status_cache[1]
+        
         data_manager = report_service.data_manager
         
         if data_manager.multi_task_service:
             status = data_manager.multi_task_service.get_tracker_status()
-            return {
+            response = {
                 "status": "success",
                 "data": status
             }
         else:
-            return {
+            response = {
                 "status": "success",
                 "data": {
                     "message": "Multi-tracker service not enabled",
                     "single_tracker_info": data_manager.get_task_tracker_info()
                 }
             }
+        
+        _tracker_status_cache = (now, response)
+        return response
     except Exception as e:
         return {"status": "error", "message": str(e)}
 
 @app.get("/config", response_class=HTMLResponse)
-async def config_page(request: Request):
+def config_page(request: Request):
     """Страница настроек конфигурации"""
-    return templates.TemplateResponse("config.html", {
+    # Данные конфигурации загружаются через /api/config, страница зависит только от шаблона
+    etag = _files_etag("templates/config.html")
+    not_modified = _not_modified(request, etag)
+    if not_modified:
+        return not_modified
+    
+    response = templates.TemplateResponse("config.html", {
         "request": request
     })
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = "no-cache"
+    return response
 
 @app.get("/api/config")
-async def get_config():
+def get_config(config_manager: ConfigManager = Depends(get_config_manager)):
     """Получает текущую конфигурацию"""
     try:
-        config_manager = ConfigManager()
+        _refresh_config(config_manager)
         config_data = config_manager.get_all_config()
         return {
             "status": "success",
@@ -170,29 +321,15 @@ async def get_config():
         return {"status": "error", "message": str(e)}
 
 @app.post("/api/config")
-async def save_config(config_data: dict):
+def save_config(config_data: dict, config_manager: ConfigManager = Depends(get_config_manager)):
     """Сохраняет конфигурацию"""
     try:
-        config_manager = ConfigManager()
-        
-        # Создаем резервную копию
-        config_manager.backup_config()
-        
-        # Сохраняем каждый раздел конфигурации
-        if 'app' in config_data:
-            config_manager.create_config_file('app.json', {'app': config_data['app']})
-        
-        if 'gitlab' in config_data:
-            config_manager.create_config_file('gitlab.json', {'gitlab': config_data['gitlab']})
-        
-        if 'confluence' in config_data:
-            config_manager.create_config_file('confluence.json', {'confluence': config_data['confluence']})
-        
-        if 'trackers' in config_data:
-            config_manager.create_config_file('trackers.json', {'trackers': config_data['trackers']})
-        
-        # Перезагружаем конфигурацию
-        config_manager.reload_config()
+        with _services_lock:
+            try:
+                _save_config_files(config_manager, config_data)
+            finally:
+                # Пересоздаем сервисы с новыми настройками
+                _reset_services()
         
         return {
             "status": "success",
@@ -202,14 +339,19 @@ async def save_config(config_data: dict):
         return {"status": "error", "message": str(e)}
 
 @app.post("/api/update-commit-date")
-async def update_commit_date(request: UpdateDateRequest):
+def update_commit_date(request: UpdateDateRequest):
     """Обновляет дату в файле commits"""
     try:
-        # Валидация даты
-        try:
-            # Парсим дату в формате YYYY-MM-DDTHH:MM
-            dt = datetime.fromisoformat(request.date)
-        except ValueError:
+        # Валидация даты: явно неверный формат отсекаем без разбора и исключений
+        dt = None
+        if _is_commit_date_format(request.date):
+            try:
+                # Парсим дату в формате YYYY-MM-DDTHH:MM
+                dt = datetime.fromisoformat(request.date)
+            except ValueError:
+                pass
+        
+        if dt is None:
             return {
                 "status": "error", 
                 "message": "Неверный формат даты. Используйте формат YYYY-MM-DDTHH:MM"
@@ -219,8 +361,7 @@ async def update_commit_date(request: UpdateDateRequest):
         iso_date = dt.isoformat() + 'Z'
         
         # Записываем в файл commits
-        with open("commits", "w", encoding="utf-8") as f:
-            f.write(iso_date)
+        _write_commit_date(iso_date)
         
         # Форматируем дату для отображения
         formatted_date = dt.strftime("%d.%m.%Y %H:%M:%S")
@@ -238,4 +379,13 @@ async def update_commit_date(request: UpdateDateRequest):
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
+    # Несколько процессов-воркеров; каждый держит свой кэш конфигурации и сверяет его с файлами.
+    # loop/http="auto" выбирают uvloop и httptools, если они установлены (uvicorn[standard], кроме Windows)
+    uvicorn.run(
+        "main:app",
+        host="0.0.0.0",
+        port=8000,
+        workers=int(os.getenv("WEB_CONCURRENCY", max(2, os.cpu_count() or 1))),
+        loop="auto",
+        http="auto"
+    )
\ No newline at end of file
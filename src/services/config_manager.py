@@ -1,9 +1,10 @@
 """
 Менеджер конфигурации для работы с множественными файлами
 """
-import json
 import os
-from typing import Dict, Any, Optional
+import threading
+import orjson
+from typing import Dict, Any, List, Optional, Set, Tuple
 from pathlib import Path
 from .base import BaseService, ConfigurationError
 from .validators import ConfigValidator
@@ -14,83 +15,188 @@ from .multi_tracker_models import MultiTrackerConfig, TaskTrackerConfig, TaskTra
 class ConfigManager(BaseService):
     """Менеджер конфигурации для работы с множественными файлами"""
     
-    def __init__(self, config_dir: str = "config"):
+    # Конфигурационные файлы в порядке загрузки
+    CONFIG_FILES = ('app.json', 'gitlab.json', 'confluence.json', 'trackers.json')
+    # Единый файл со всеми разделами (режим consolidated)
+    CONSOLIDATED_CONFIG_FILE = 'config.json'
+    
+    def __init__(self, config_dir: str = "config", consolidated: Optional[bool] = None):
         super().__init__(None)
         self.config_dir = Path(config_dir)
         self.logger = get_logger(self.__class__.__name__)
+        # По умолчанию единый файл используется, если он уже существует
+        if consolidated is None:
+            consolidated = (self.config_dir / self.CONSOLIDATED_CONFIG_FILE).exists()
+        self.consolidated = consolidated
+        self._config_files = (self.CONSOLIDATED_CONFIG_FILE,) if consolidated else self.CONFIG_FILES
         self._config_cache = {}
-        self._load_all_configs()
+        # (mtime, size) загруженных файлов для дешевой проверки актуальности
+        self._stat_cache: Dict[str, Optional[Tuple[int, int]]] = {}
+        # Разделы конфигурации, загруженные из каждого файла
+        self._file_sections: Dict[str, List[str]] = {}
+        # Файлы, которые уже загружены и провалидированы (разделы читаются при первом обращении)
+        self._loaded_files: Set[str] = set()
+        # Собранная конфигурация трекеров и раздел, из которого она построена
+        self._multi_tracker_cache: Optional[Tuple[Dict[str, Any], MultiTrackerConfig]] = None
+        # Legacy-разделы конфигурации трекеров и раздел trackers, из которого они получены
+        self._legacy_cache: Dict[str, Dict[str, Any]] = {}
+        self._legacy_source: Optional[Dict[str, Any]] = None
+        # Хэши содержимого разделов, успешно прошедших валидацию
+        self._validated_hashes: Dict[str, int] = {}
+        # Защищает загрузку, перезагрузку и сохранение файлов при обращении из нескольких потоков
+        self._lock = threading.RLock()
+        
+        # Проверяем существование директории конфигурации
+        if not self.config_dir.exists():
+            self.logger.warning(f"Config directory {self.config_dir} does not exist, creating...")
+            self.config_dir.mkdir(parents=True, exist_ok=True)
     
     def _load_all_configs(self) -> None:
         """Загружает все конфигурационные файлы"""
         try:
-            # Проверяем существование директории конфигурации
-            if not self.config_dir.exists():
-                self.logger.warning(f"Config directory {self.config_dir} does not exist, creating...")
-                self.config_dir.mkdir(parents=True, exist_ok=True)
-            
             # Загружаем основные конфигурации
-            self._load_config_file('app.json')
-            self._load_config_file('gitlab.json')
-            self._load_config_file('confluence.json')
-            self._load_config_file('trackers.json')
+            for filename in self._config_files:
+                self._ensure_config_file(filename)
             
-            # Валидируем конфигурации
-            self._validate_all_configs()
-            
-            self.logger.info("All configuration files loaded successfully")
+            self.logger.debug("All configuration files loaded successfully")
             
         except Exception as e:
             self.logger.error(f"Error loading configuration files: {str(e)}")
             raise ConfigurationError(f"Failed to load configuration: {str(e)}")
     
-    def _load_config_file(self, filename: str) -> None:
-        """Загружает отдельный конфигурационный файл"""
+    def _ensure_config_file(self, filename: str) -> None:
+        """Загружает и валидирует конфигурационный файл при первом обращении"""
+        if filename in self._loaded_files:
+            return
+        
+        with self._lock:
+            # Файл мог загрузить другой поток, пока мы ждали блокировку
+            if filename in self._loaded_files:
+                return
+            
+            # Невалидный файл не попадает в кэш, следующее обращение повторит загрузку
+            self._install_file_sections(filename, *self._load_config_file(filename))
+    
+    def _ensure_section(self, section: str) -> None:
+        """Загружает раздел конфигурации при первом обращении"""
+        self._ensure_config_file(self._section_file(section))
+    
+    def _section_file(self, section: str) -> str:
+        """Возвращает имя файла, в котором хранится раздел конфигурации"""
+        return self.CONSOLIDATED_CONFIG_FILE if self.consolidated else f"{section}.json"
+    
+    def _drop_file_sections(self, filename: str) -> None:
+        """Удаляет из кэша разделы, загруженные из файла"""
+        for section in self._file_sections.pop(filename, ()):
+            self._config_cache.pop(section, None)
+    
+    def _install_file_sections(self, filename: str, file_stat: Optional[Tuple[int, int]],
+                               file_config: Dict[str, Any]) -> None:
+        """Подменяет в кэше разделы файла новыми, не оставляя момента, когда раздела нет в кэше"""
+        previous_sections = self._file_sections.get(filename, ())
+        self._config_cache.update(file_config)
+        for section in previous_sections:
+            if section not in file_config:
+                self._config_cache.pop(section, None)
+        self._file_sections[filename] = list(file_config)
+        self._stat_cache[filename] = file_stat
+        self._loaded_files.add(filename)
+    
+    def _load_config_file(self, filename: str) -> Tuple[Optional[Tuple[int, int]], Dict[str, Any]]:
+        """Читает и валидирует отдельный конфигурационный файл, не изменяя кэш"""
         config_path = self.config_dir / filename
+        file_stat = self._stat_file(config_path)
         
         if not config_path.exists():
             self.logger.warning(f"Config file {filename} not found, skipping...")
-            return
+            return file_stat, {}
         
         try:
-            with open(config_path, 'r', encoding='utf-8') as f:
-                config_data = json.load(f)
+            with open(config_path, 'rb') as f:
+                config_data = orjson.loads(f.read())
+            
+            if filename == self.CONSOLIDATED_CONFIG_FILE:
+                # Единый файл содержит все разделы верхнего уровня
+                config_keys = list(config_data)
+            else:
+                # Извлекаем ключ конфигурации (первый ключ в JSON)
+                config_keys = [next(iter(config_data))]
             
-            # Извлекаем ключ конфигурации (первый ключ в JSON)
-            config_key = list(config_data.keys())[0]
-            self._config_cache[config_key] = config_data[config_key]
+            file_config = {config_key: config_data[config_key] for config_key in config_keys}
             
-            self.logger.debug(f"Loaded config section '{config_key}' from {filename}")
+            self.logger.debug(f"Loaded config sections {config_keys} from {filename}")
             
         except Exception as e:
             self.logger.error(f"Error loading config file {filename}: {str(e)}")
             raise ConfigurationError(f"Failed to load {filename}: {str(e)}")
+        
+        if file_config:
+            self._validate_all_configs(set(file_config), file_config)
+        return file_stat, file_config
+    
+    @staticmethod
+    def _stat_file(config_path: Path) -> Optional[Tuple[int, int]]:
+        """Возвращает (mtime, size) файла или None, если файла нет"""
+        try:
+            stat = config_path.stat()
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+    
+    def _is_file_stale(self, filename: str) -> bool:
+        """Проверяет, изменился ли файл с момента последней загрузки"""
+        return self._stat_file(self.config_dir / filename) != self._stat_cache.get(filename)
     
-    def _validate_all_configs(self) -> None:
-        """Валидирует все загруженные конфигурации"""
+    def is_stale(self) -> bool:
+        """Проверяет, изменились ли конфигурационные файлы на диске (без чтения и разбора)"""
+        with self._lock:
+            return any(self._is_file_stale(filename) for filename in self._loaded_files)
+    
+    def _validate_all_configs(self, sections: Optional[Set[str]] = None,
+                              config: Optional[Dict[str, Any]] = None) -> None:
+        """Валидирует конфигурации (все или только указанные разделы) из кэша или переданного словаря"""
+        if config is None:
+            config = self._config_cache
+        
         try:
             # Валидируем GitLab конфигурацию
-            if 'gitlab' in self._config_cache:
-                ConfigValidator.validate_gitlab_config(self._config_cache['gitlab'])
+            section_hash = self._get_unvalidated_hash('gitlab', sections, config)
+            if section_hash is not None:
+                ConfigValidator.validate_gitlab_config(config['gitlab'])
+                self._validated_hashes['gitlab'] = section_hash
             
             # Валидируем Confluence конфигурацию
-            if 'confluence' in self._config_cache:
-                ConfigValidator.validate_confluence_config(self._config_cache['confluence'])
+            section_hash = self._get_unvalidated_hash('confluence', sections, config)
+            if section_hash is not None:
+                ConfigValidator.validate_confluence_config(config['confluence'])
+                self._validated_hashes['confluence'] = section_hash
             
             # Валидируем конфигурацию трекеров
-            if 'trackers' in self._config_cache:
-                self._validate_trackers_config()
+            section_hash = self._get_unvalidated_hash('trackers', sections, config)
+            if section_hash is not None:
+                self._validate_trackers_config(config['trackers'])
+                self._validated_hashes['trackers'] = section_hash
             
-            self.logger.info("All configurations validated successfully")
+            self.logger.debug(f"Configurations validated successfully: {', '.join(sorted(sections)) if sections else 'all'}")
             
         except Exception as e:
             self.logger.error(f"Configuration validation failed: {str(e)}")
             raise ConfigurationError(f"Configuration validation failed: {str(e)}")
     
-    def _validate_trackers_config(self) -> None:
-        """Валидирует конфигурацию трекеров"""
-        trackers_config = self._config_cache['trackers']
+    def _get_unvalidated_hash(self, section: str, sections: Optional[Set[str]],
+                              config: Dict[str, Any]) -> Optional[int]:
+        """Возвращает хэш раздела, если его нужно валидировать, иначе None"""
+        if section not in config or (sections is not None and section not in sections):
+            return None
         
+        # Раздел с тем же содержимым уже проходил валидацию (например, сохранен без изменений)
+        section_hash = hash(orjson.dumps(config[section], option=orjson.OPT_SORT_KEYS))
+        if self._validated_hashes.get(section) == section_hash:
+            return None
+        return section_hash
+    
+    def _validate_trackers_config(self, trackers_config: Dict[str, Any]) -> None:
+        """Валидирует конфигурацию трекеров"""
         if not trackers_config.get('enabled', True):
             return
         
@@ -112,28 +218,42 @@ class ConfigManager(BaseService):
     
     def get_app_config(self) -> Dict[str, Any]:
         """Получает конфигурацию приложения"""
+        self._ensure_section('app')
         return self._config_cache.get('app', {})
     
     def get_gitlab_config(self) -> Dict[str, str]:
         """Получает конфигурацию GitLab"""
+        self._ensure_section('gitlab')
         if 'gitlab' not in self._config_cache:
             raise ConfigurationError("GitLab configuration not found")
         return self._config_cache['gitlab']
     
     def get_confluence_config(self) -> Dict[str, str]:
         """Получает конфигурацию Confluence"""
+        self._ensure_section('confluence')
         if 'confluence' not in self._config_cache:
             raise ConfigurationError("Confluence configuration not found")
         return self._config_cache['confluence']
     
     def get_multi_tracker_config(self) -> MultiTrackerConfig:
         """Получает конфигурацию множественных таск-трекеров"""
+        self._ensure_section('trackers')
         if 'trackers' not in self._config_cache:
             # Возвращаем конфигурацию на основе legacy настроек
             raise ConfigurationError("Task trackers configuration not found")
         
         trackers_config = self._config_cache['trackers']
         
+        # Раздел заменяется новым объектом при любой перезагрузке или сохранении
+        if self._multi_tracker_cache and self._multi_tracker_cache[0] is trackers_config:
+            return self._multi_tracker_cache[1]
+        
+        multi_tracker_config = self._build_multi_tracker_config(trackers_config)
+        self._multi_tracker_cache = (trackers_config, multi_tracker_config)
+        return multi_tracker_config
+    
+    def _build_multi_tracker_config(self, trackers_config: Dict[str, Any]) -> MultiTrackerConfig:
+        """Строит конфигурацию множественных таск-трекеров из раздела trackers"""
         if not trackers_config.get('enabled', True):
             return MultiTrackerConfig(trackers=[], deduplication_enabled=False)
         
@@ -161,6 +281,7 @@ class ConfigManager(BaseService):
     
     def get_config_value(self, section: str, key: str, default: Any = None) -> Any:
         """Получает значение конфигурации по секции и ключу"""
+        self._ensure_section(section)
         try:
             return self._config_cache[section][key]
         except KeyError:
@@ -170,14 +291,35 @@ class ConfigManager(BaseService):
     
     def get_all_config(self) -> Dict[str, Any]:
         """Получает всю конфигурацию"""
+        self._load_all_configs()
         return self._config_cache.copy()
     
     def reload_config(self) -> None:
-        """Перезагружает конфигурацию"""
+        """Перезагружает конфигурацию, перечитывая только измененные файлы"""
         self.logger.info("Reloading configuration...")
-        self._config_cache.clear()
-        self._load_all_configs()
-        self.logger.info("Configuration reloaded successfully")
+        
+        with self._lock:
+            # Незагруженные разделы будут прочитаны с диска при первом обращении
+            stale_files = [
+                filename for filename in self._config_files
+                if filename in self._loaded_files and self._is_file_stale(filename)
+            ]
+            if not stale_files:
+                self.logger.info("Configuration files not changed, nothing to reload")
+                return
+            
+            try:
+                # Сначала читаем и валидируем все измененные файлы, текущий кэш при этом не трогаем
+                loaded = [(filename, *self._load_config_file(filename)) for filename in stale_files]
+            except Exception as e:
+                self.logger.error(f"Error reloading configuration: {str(e)}")
+                raise ConfigurationError(f"Failed to reload configuration: {str(e)}")
+            
+            # Подменяем разделы только после успешной загрузки всех файлов
+            for filename, file_stat, file_config in loaded:
+                self._install_file_sections(filename, file_stat, file_config)
+        
+        self.logger.info(f"Configuration reloaded successfully: {', '.join(stale_files)}")
     
     def get_config_file_path(self, filename: str) -> Path:
         """Получает путь к конфигурационному файлу"""
@@ -188,8 +330,9 @@ class ConfigManager(BaseService):
         config_path = self.config_dir / filename
         
         try:
-            with open(config_path, 'w', encoding='utf-8') as f:
-                json.dump(config_data, f, indent=2, ensure_ascii=False)
+            # Формат совпадает с json.dump(indent=2, ensure_ascii=False)
+            with open(config_path, 'wb') as f:
+                f.write(orjson.dumps(config_data, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS))
             
             self.logger.info(f"Created config file: {filename}")
             
@@ -197,41 +340,111 @@ class ConfigManager(BaseService):
             self.logger.error(f"Error creating config file {filename}: {str(e)}")
             raise ConfigurationError(f"Failed to create {filename}: {str(e)}")
     
+    def save_config_sections(self, sections: Dict[str, Any]) -> None:
+        """Сохраняет разделы конфигурации в их файлы и обновляет кэш без повторного чтения"""
+        with self._lock:
+            self._save_config_sections(sections)
+    
+    def _save_config_sections(self, sections: Dict[str, Any]) -> None:
+        """Сохраняет разделы конфигурации, вызывается под блокировкой"""
+        if self.consolidated:
+            # Сливаем новые разделы с текущими и пишем единый файл одной операцией
+            self._load_all_configs()
+            merged = {**self._config_cache, **sections}
+            file_sections = {self.CONSOLIDATED_CONFIG_FILE: merged}
+        else:
+            file_sections = {f"{section}.json": {section: data} for section, data in sections.items()}
+        
+        # Сериализуем все файлы до записи, чтобы ошибка не оставила часть файлов обновленной
+        payloads = [
+            (filename, content,
+             orjson.dumps(content, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS))
+            for filename, content in file_sections.items()
+        ]
+        
+        tmp_paths = []
+        try:
+            for filename, _, payload in payloads:
+                tmp_path = self.config_dir / f".{filename}.tmp"
+                tmp_paths.append(tmp_path)
+                with open(tmp_path, 'wb') as f:
+                    f.write(payload)
+            
+            # Подменяем файлы атомарно только после успешной записи всех временных файлов
+            for (filename, _, _), tmp_path in zip(payloads, tmp_paths):
+                os.replace(tmp_path, self.config_dir / filename)
+            
+        except Exception as e:
+            for tmp_path in tmp_paths:
+                if tmp_path.exists():
+                    tmp_path.unlink()
+            self.logger.error(f"Error saving config sections: {str(e)}")
+            raise ConfigurationError(f"Failed to save configuration: {str(e)}")
+        
+        # Кладем записанные данные прямо в кэш
+        for filename, content, _ in payloads:
+            self._config_cache.update(content)
+            self._file_sections[filename] = list(content)
+            self._stat_cache[filename] = self._stat_file(self.config_dir / filename)
+            self._loaded_files.add(filename)
+        
+        try:
+            self._validate_all_configs(set(sections))
+        except ConfigurationError:
+            # Невалидные разделы будут перечитаны и проверены при следующем обращении
+            for filename, _, _ in payloads:
+                self._loaded_files.discard(filename)
+                self._drop_file_sections(filename)
+            raise
+        
+        self.logger.info(f"Saved config sections: {', '.join(sections)}")
+    
     def backup_config(self, backup_dir: str = "config/backup") -> None:
         """Создает резервную копию конфигурации"""
         backup_path = Path(backup_dir)
         backup_path.mkdir(parents=True, exist_ok=True)
         
-        import shutil
+        import tarfile
         from datetime import datetime
         
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        backup_file = backup_path / f"config_{timestamp}.tar.gz"
         
         try:
-            for config_file in self.config_dir.glob("*.json"):
-                backup_file = backup_path / f"{config_file.stem}_{timestamp}.json"
-                shutil.copy2(config_file, backup_file)
+            # Все файлы конфигурации упаковываются в один архив вместо копирования по одному
+            with tarfile.open(backup_file, "w:gz") as tar:
+                for config_file in self.config_dir.glob("*.json"):
+                    tar.add(config_file, arcname=config_file.name)
             
-            self.logger.info(f"Configuration backed up to {backup_dir}")
+            self.logger.info(f"Configuration backed up to {backup_file}")
             
         except Exception as e:
             self.logger.error(f"Error creating backup: {str(e)}")
             raise ConfigurationError(f"Failed to create backup: {str(e)}")
     
+    def _get_legacy_config(self, key: str, default: Dict[str, Any]) -> Dict[str, Any]:
+        """Получает legacy-раздел конфигурации трекеров, запоминая результат до изменения раздела trackers"""
+        self._ensure_section('trackers')
+        trackers_config = self._config_cache.get('trackers')
+        
+        # Раздел trackers заменяется новым объектом при перезагрузке или сохранении
+        if self._legacy_source is not trackers_config:
+            self._legacy_cache = {}
+            self._legacy_source = trackers_config
+        
+        if key not in self._legacy_cache:
+            legacy_config = (trackers_config or {}).get('legacy', {})
+            self._legacy_cache[key] = legacy_config.get(key, default)
+        return self._legacy_cache[key]
+    
     def get_task_tracker_config(self) -> Dict[str, Any]:
         """Получает конфигурацию таск-трекера (для обратной совместимости)"""
-        trackers_config = self._config_cache.get('trackers', {})
-        legacy_config = trackers_config.get('legacy', {})
-        return legacy_config.get('task_tracker', {'type': 'jira', 'enabled': False})
+        return self._get_legacy_config('task_tracker', {'type': 'jira', 'enabled': False})
     
     def get_1c_config(self) -> Dict[str, str]:
         """Получает конфигурацию 1C"""
-        trackers_config = self._config_cache.get('trackers', {})
-        legacy_config = trackers_config.get('legacy', {})
-        return legacy_config.get('1c', {})
+        return self._get_legacy_config('1c', {})
     
     def get_jira_config(self) -> Dict[str, str]:
         """Получает конфигурацию Jira"""
-        trackers_config = self._config_cache.get('trackers', {})
-        legacy_config = trackers_config.get('legacy', {})
-        return legacy_config.get('jira', {})
\ No newline at end of file
+        return self._get_legacy_config('jira', {})
@@ -1,16 +1,53 @@
 """
 Сервис для получения данных Confluence, связанных с задачами
 """
-import re
-from typing import List, Dict, Any, Optional
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from itertools import chain
+from typing import List, Dict, Any, Iterator, Optional
 from .base import BaseService
 from .confluence_service import ConfluenceService
+from .constants import CONFLUENCE_URL_RE, FILE_PATHS
 from .logger_config import get_logger
 
+# Соединения с базами заголовков, общие для всех экземпляров сервиса в процессе: путь -> соединение
+_TITLE_DBS: Dict[str, sqlite3.Connection] = {}
+_TITLE_DB_LOCK = threading.Lock()
+# Время ожидания (в секундах) блокировки базы, которую пишет другой процесс
+_TITLE_DB_BUSY_TIMEOUT = 5.0
+
+
+def _get_title_db(path: str) -> sqlite3.Connection:
+    """Возвращает общее соединение с SQLite базой заголовков, открывая его при первом обращении"""
+    with _TITLE_DB_LOCK:
+        connection = _TITLE_DBS.get(path)
+        if connection is None:
+            # Соединение используется из потоков пула, доступ защищен _TITLE_DB_LOCK
+            connection = sqlite3.connect(
+                path, timeout=_TITLE_DB_BUSY_TIMEOUT, isolation_level=None, check_same_thread=False
+            )
+            # WAL позволяет нескольким процессам uvicorn читать базу во время записи
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS titles(url TEXT PRIMARY KEY, title TEXT, fetched_at INTEGER)"
+            )
+            _TITLE_DBS[path] = connection
+        return connection
+
 
 class ConfluenceDataService(BaseService):
     """Сервис для получения данных Confluence, связанных с задачами"""
     
+    # Число параллельных запросов заголовков страниц
+    TITLE_FETCH_WORKERS = 16
+    # Время жизни заголовка в кэше (секунды)
+    TITLE_CACHE_TTL = 24 * 60 * 60
+    # Поля задачи Jira, из которых извлекаются страницы Confluence
+    JIRA_ISSUE_FIELDS = 'attachment,issuelinks'
+    
     def __init__(self, config_manager):
         super().__init__(config_manager)
         self.logger = get_logger(self.__class__.__name__)
@@ -21,9 +58,33 @@ class ConfluenceDataService(BaseService):
             self.enabled = True
             self.logger.info("Confluence data service initialized successfully")
         except Exception as e:
-            self.logger.warning(f"Confluence data service disabled: {str(e)}")
+            self.logger.warning("Confluence data service disabled: %s", e)
             self.confluence_service = None
             self.enabled = False
+        
+        # Кэш заголовков страниц по очищенному URL, общий для процессов и сохраняемый между запусками
+        self._title_db = None
+        if self.enabled:
+            app_config = config_manager.get_app_config()
+            self._title_db = self._open_title_db(os.path.join(
+                app_config.get('data_dir', FILE_PATHS['data_dir']),
+                app_config.get('confluence_titles_cache', FILE_PATHS['confluence_titles_cache'])
+            ))
+    
+    def _open_title_db(self, path: str) -> Optional[sqlite3.Connection]:
+        """Открывает SQLite базу с заголовками страниц Confluence в каталоге данных"""
+        try:
+            path = os.path.abspath(path)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            return _get_title_db(path)
+        except (OSError, sqlite3.Error) as e:
+            self.logger.warning("Confluence titles cache file unavailable, using in-memory cache: %s", e)
+        
+        try:
+            return _get_title_db(':memory:')
+        except sqlite3.Error as e:
+            self.logger.warning("Confluence titles cache disabled: %s", e)
+            return None
     
     def enrich_tasks_with_confluence_data(self, tasks: List[Dict[str, Any]], 
                                         jira_service=None) -> List[Dict[str, Any]]:
@@ -35,198 +96,243 @@ class ConfluenceDataService(BaseService):
             jira_service: Опциональный JiraService для получения дополнительных данных
             
         Returns:
-            Список задач с добавленными данными Confluence
+            Тот же список задач, дополненный данными Confluence (задачи изменяются на месте)
         """
         if not self.enabled or not self.confluence_service:
             self.logger.info("Confluence data service is disabled, skipping enrichment")
             return tasks
         
-        enriched_tasks = []
+        # Загружаем задачи Jira пакетными запросами вместо запроса на каждую задачу
+        issues_by_key = {}
+        if jira_service:
+            issues_by_key = self._prefetch_jira_issues(
+                [task.get('task_number', '') for task in tasks], 
+                jira_service
+            )
+        
+        # Заранее получаем заголовки всех найденных страниц параллельно
+        texts = [task.get('description', '') for task in tasks]
+        for issue in issues_by_key.values():
+            texts.append(self._get_issue_link_text(issue))
+        self._prefetch_page_titles(texts)
         
         for task in tasks:
             try:
                 # Получаем данные Confluence для задачи
-                confluence_pages = self._get_confluence_pages_for_task(task, jira_service)
-                
-                # Создаем обогащенную задачу
-                enriched_task = task.copy()
-                enriched_task['confluence_pages'] = confluence_pages
+                confluence_pages = self._get_confluence_pages_for_task(
+                    task, jira_service, issues_by_key.get(task.get('task_number', ''))
+                )
                 
-                enriched_tasks.append(enriched_task)
+                # Дополняем задачу на месте, без копирования словаря
+                task['confluence_pages'] = confluence_pages
                 
             except Exception as e:
-                self.logger.error(f"Error enriching task {task.get('task_number', 'unknown')} with Confluence data: {str(e)}")
-                # В случае ошибки возвращаем исходную задачу
-                enriched_tasks.append(task)
+                # В случае ошибки задача остается без изменений
+                self.logger.error("Error enriching task %s with Confluence data: %s", task.get('task_number', 'unknown'), e)
         
-        self.logger.info(f"Enriched {len(enriched_tasks)} tasks with Confluence data")
-        return enriched_tasks
+        self.logger.info("Enriched %d tasks with Confluence data", len(tasks))
+        return tasks
+    
+    def _prefetch_jira_issues(self, task_numbers: List[str], jira_service) -> Dict[str, Any]:
+        """
+        Получает задачи Jira пакетными JQL запросами
+        
+        Args:
+            task_numbers: Номера задач
+            jira_service: Сервис Jira
+            
+        Returns:
+            Словарь задач Jira по ключу
+        """
+        keys = list(dict.fromkeys(number for number in task_numbers if number))
+        if not keys:
+            return {}
+        
+        try:
+            # JiraService отбрасывает номера, не являющиеся ключами Jira, и делит ключи на пакеты
+            return jira_service.get_issues(keys, self.JIRA_ISSUE_FIELDS)
+        except Exception as e:
+            self.logger.error("Error prefetching Jira issues: %s", e)
+            return {}
+    
+    def _prefetch_page_titles(self, texts: List[str]) -> None:
+        """
+        Получает заголовки страниц Confluence из текстов пакетными CQL запросами,
+        оставшиеся страницы запрашиваются параллельно по одной
+        
+        Args:
+            texts: Тексты для поиска ссылок
+        """
+        texts = [str(text) for text in texts if text]
+        urls = {
+            url
+            for text in texts if 'confluence' in text
+            for url in CONFLUENCE_URL_RE.findall(text)
+        }
+        urls = [
+            url for url in urls
+            if url and self._load_persisted_title(url) is None
+        ]
+        if not urls:
+            return
+        
+        if hasattr(self.confluence_service, 'get_titles_by_urls'):
+            try:
+                titles = self.confluence_service.get_titles_by_urls(urls)
+                for url, page_title in titles.items():
+                    self._cache_title(url, page_title)
+                urls = [url for url in urls if url not in titles]
+            except Exception as e:
+                self.logger.error("Error getting page titles in bulk: %s", e)
+            
+            if not urls:
+                return
+        
+        # Заголовки попадают в кэш внутри _get_page_title_by_url
+        with ThreadPoolExecutor(max_workers=min(self.TITLE_FETCH_WORKERS, len(urls))) as executor:
+            list(executor.map(self._get_page_title_by_url, urls))
     
     def _get_confluence_pages_for_task(self, task: Dict[str, Any], 
-                                     jira_service=None) -> List[Dict[str, str]]:
+                                     jira_service=None, issue=None) -> List[Dict[str, str]]:
         """
         Получает страницы Confluence, связанные с задачей
         
         Args:
             task: Данные задачи
             jira_service: Опциональный JiraService для получения дополнительных данных
+            issue: Предварительно загруженная задача Jira
             
         Returns:
             Список страниц Confluence
         """
-        confluence_pages = []
+        # Страницы по URL: дубликаты отбрасываются сразу при добавлении
+        pages_by_url: Dict[str, Dict[str, str]] = {}
         
         try:
-            # Получаем данные из описания задачи
-            description_pages = self._extract_confluence_pages_from_text(
-                task.get('description', '')
-            )
-            confluence_pages.extend(description_pages)
-            
-            # Если есть JiraService, получаем дополнительные данные из Jira
+            # Страницы из описания задачи и, если есть JiraService, из самой задачи Jira
+            sources = [self._iter_pages_from_text(task.get('description', ''))]
             if jira_service and hasattr(jira_service, 'jira'):
-                jira_pages = self._get_confluence_pages_from_jira(
+                sources.append(self._iter_pages_from_jira(
                     task.get('task_number', ''), 
-                    jira_service
-                )
-                confluence_pages.extend(jira_pages)
+                    jira_service,
+                    issue
+                ))
             
-            # Удаляем дубликаты по URL
-            confluence_pages = self._deduplicate_confluence_pages(confluence_pages)
+            for page in chain.from_iterable(sources):
+                if page.get('url'):
+                    pages_by_url.setdefault(page['url'], page)
             
         except Exception as e:
-            self.logger.error(f"Error getting Confluence pages for task {task.get('task_number', 'unknown')}: {str(e)}")
+            self.logger.error("Error getting Confluence pages for task %s: %s", task.get('task_number', 'unknown'), e)
         
-        return confluence_pages
+        return list(pages_by_url.values())
     
-    def _extract_confluence_pages_from_text(self, text: str) -> List[Dict[str, str]]:
+    def _iter_pages_from_text(self, text: str, source: str = 'description') -> Iterator[Dict[str, str]]:
         """
         Извлекает ссылки на Confluence из текста
         
         Args:
             text: Текст для поиска ссылок
+            source: Источник ссылки для поля source
             
-        Returns:
-            Список страниц Confluence
+        Yields:
+            Страницы Confluence
         """
-        confluence_pages = []
-        
-        if not text:
-            return confluence_pages
+        # Шаблон ссылки регистрозависим, поэтому без подстроки 'confluence' совпадений не будет
+        if not text or 'confluence' not in text:
+            return
         
         try:
-            # Ищем ссылки на Confluence
-            confluence_urls = re.findall(
-                r'https?://[^/]*confluence[^/]*/[^\s<>"\']*', 
-                text
-            )
-            
-            for url in confluence_urls:
-                # Очищаем URL от лишних параметров
-                clean_url = self._clean_confluence_url(url)
-                
-                if clean_url:
-                    page_title = self._get_page_title_by_url(clean_url)
+            # Ищем ссылки на Confluence, уже обрезанные до pageId
+            for url in CONFLUENCE_URL_RE.findall(text):
+                if url:
+                    page_title = self._get_page_title_by_url(url)
                     
-                    confluence_pages.append({
+                    yield {
                         'filename': page_title,
-                        'url': clean_url,
+                        'url': url,
                         'created': 'Unknown',
                         'author': 'Unknown',
-                        'source': 'description'
-                    })
+                        'source': source
+                    }
         
         except Exception as e:
-            self.logger.error(f"Error extracting Confluence pages from text: {str(e)}")
-        
-        return confluence_pages
+            self.logger.error("Error extracting Confluence pages from text: %s", e)
     
-    def _get_confluence_pages_from_jira(self, task_number: str, 
-                                      jira_service) -> List[Dict[str, str]]:
+    def _iter_pages_from_jira(self, task_number: str, 
+                              jira_service, issue=None) -> Iterator[Dict[str, str]]:
         """
         Получает страницы Confluence из Jira задачи
         
         Args:
             task_number: Номер задачи Jira
             jira_service: Сервис Jira
+            issue: Предварительно загруженная задача Jira
             
-        Returns:
-            Список страниц Confluence
+        Yields:
+            Страницы Confluence
         """
-        confluence_pages = []
-        
         try:
-            issue = jira_service.jira.issue(task_number)
+            # Запрашиваем задачу отдельно, только если ее нет в пакетной выборке
+            if issue is None:
+                issue = jira_service.jira.issue(task_number, fields=self.JIRA_ISSUE_FIELDS)
             
             # Получаем все прикрепления к задаче
-            attachments = issue.fields.attachment
+            attachments = getattr(issue.fields, 'attachment', None)
             if attachments:
                 for attachment in attachments:
-                    if (hasattr(attachment, 'filename') and 
-                        attachment.filename and 
-                        ('confluence' in attachment.filename.lower() or 
-                         attachment.filename.endswith('.html') or
-                         attachment.filename.endswith('.htm'))):
-                        
-                        confluence_pages.append({
-                            'filename': attachment.filename,
+                    filename = getattr(attachment, 'filename', None)
+                    if not filename:
+                        continue
+                    
+                    if 'confluence' in filename.lower() or filename.endswith(('.html', '.htm')):
+                        author = getattr(attachment, 'author', None)
+                        yield {
+                            'filename': filename,
                             'url': attachment.content,
                             'created': attachment.created,
-                            'author': attachment.author.displayName if hasattr(attachment, 'author') else 'Unknown',
+                            'author': author.displayName if author is not None else 'Unknown',
                             'source': 'attachment'
-                        })
+                        }
             
-            # Ищем ссылки в связях задачи
-            if hasattr(issue.fields, 'issuelinks') and issue.fields.issuelinks:
-                for link in issue.fields.issuelinks:
-                    link_fields = []
-                    if hasattr(link, 'outwardIssue') and hasattr(link.outwardIssue.fields, 'summary'):
-                        link_fields.append(link.outwardIssue.fields.summary)
-                    if hasattr(link, 'inwardIssue') and hasattr(link.inwardIssue.fields, 'summary'):
-                        link_fields.append(link.inwardIssue.fields.summary)
-                    if hasattr(link, 'comment') and link.comment:
-                        link_fields.append(link.comment)
-                    
-                    for field_text in link_fields:
-                        if field_text:
-                            text_pages = self._extract_confluence_pages_from_text(str(field_text))
-                            for page in text_pages:
-                                page['source'] = 'issue_link'
-                            confluence_pages.extend(text_pages)
+            # Ищем ссылки в связях задачи одним проходом по их общему тексту
+            yield from self._iter_pages_from_text(self._get_issue_link_text(issue), source='issue_link')
         
         except Exception as e:
-            self.logger.error(f"Error getting Confluence pages from Jira task {task_number}: {str(e)}")
-        
-        return confluence_pages
+            self.logger.error("Error getting Confluence pages from Jira task %s: %s", task_number, e)
     
-    def _clean_confluence_url(self, url: str) -> str:
+    def _get_issue_link_text(self, issue) -> str:
         """
-        Очищает URL Confluence от лишних параметров
+        Получает тексты связей задачи Jira, в которых могут быть ссылки на Confluence
         
         Args:
-            url: Исходный URL
+            issue: Задача Jira
             
         Returns:
-            Очищенный URL
+            Непустые тексты, объединенные через перевод строки
         """
-        try:
-            # Обрезаем ссылку до pageId=число, если есть
-            pageid_match = re.search(r'(pageId=\d+)', url)
-            if pageid_match:
-                # Оставляем только до pageId=число
-                clean_url = re.sub(r'(pageId=\d+).*', r'\1', url)
-                # Восстанавливаем ссылку до pageId=число
-                clean_url = url[:url.find(pageid_match.group(1)) + len(pageid_match.group(1))]
-                return clean_url
-            else:
-                return url
-        except Exception as e:
-            self.logger.error(f"Error cleaning Confluence URL {url}: {str(e)}")
-            return url
+        link_fields = []
+        
+        issuelinks = getattr(issue.fields, 'issuelinks', None)
+        if issuelinks:
+            for link in issuelinks:
+                for linked_issue in (getattr(link, 'outwardIssue', None), getattr(link, 'inwardIssue', None)):
+                    if linked_issue is not None:
+                        summary = getattr(linked_issue.fields, 'summary', None)
+                        if summary:
+                            link_fields.append(summary)
+                comment = getattr(link, 'comment', None)
+                if comment:
+                    link_fields.append(comment)
+        
+        return '\n'.join(
+            field_text if isinstance(field_text, str) else str(field_text)
+            for field_text in link_fields
+        )
     
     def _get_page_title_by_url(self, url: str) -> str:
         """
-        Получает заголовок страницы Confluence по URL
+        Получает заголовок страницы Confluence по URL (с кэшированием)
         
         Args:
             url: URL страницы Confluence
@@ -234,35 +340,49 @@ class ConfluenceDataService(BaseService):
         Returns:
             Заголовок страницы
         """
+        page_title = self._load_persisted_title(url)
+        if page_title is not None:
+            return page_title
+        
         try:
             if self.confluence_service and hasattr(self.confluence_service, 'get_page_title_by_url'):
-                return self.confluence_service.get_page_title_by_url(url)
+                page_title = self.confluence_service.get_page_title_by_url(url)
+                self._cache_title(url, page_title)
+                return page_title
             else:
                 return 'Confluence Page'
         except Exception as e:
-            self.logger.error(f"Error getting page title for URL {url}: {str(e)}")
+            self.logger.error("Error getting page title for URL %s: %s", url, e)
             return 'Confluence Page'
     
-    def _deduplicate_confluence_pages(self, pages: List[Dict[str, str]]) -> List[Dict[str, str]]:
-        """
-        Удаляет дубликаты страниц Confluence по URL
-        
-        Args:
-            pages: Список страниц Confluence
-            
-        Returns:
-            Список уникальных страниц
-        """
-        seen_urls = set()
-        unique_pages = []
-        
-        for page in pages:
-            url = page.get('url', '')
-            if url and url not in seen_urls:
-                seen_urls.add(url)
-                unique_pages.append(page)
+    def _cache_title(self, url: str, page_title: str) -> None:
+        """Сохраняет заголовок страницы в кэш"""
+        if self._title_db is None:
+            return
+        try:
+            with _TITLE_DB_LOCK:
+                self._title_db.execute(
+                    "INSERT OR REPLACE INTO titles(url, title, fetched_at) VALUES (?, ?, ?)",
+                    (url, page_title, int(time.time()))
+                )
+        except sqlite3.Error as e:
+            self.logger.warning("Error saving page title for URL %s: %s", url, e)
+    
+    def _load_persisted_title(self, url: str) -> Optional[str]:
+        """Получает заголовок из кэша, если он не устарел"""
+        if self._title_db is None:
+            return None
+        try:
+            with _TITLE_DB_LOCK:
+                row = self._title_db.execute(
+                    "SELECT title FROM titles WHERE url = ? AND fetched_at > ?",
+                    (url, int(time.time()) - self.TITLE_CACHE_TTL)
+                ).fetchone()
+        except sqlite3.Error as e:
+            self.logger.warning("Error reading page title for URL %s: %s", url, e)
+            return None
         
-        return unique_pages
+        return row[0] if row else None
     
     def is_enabled(self) -> bool:
         """Проверяет, включен ли сервис"""
@@ -1,10 +1,61 @@
 """
 Генератор отчетов для Confluence
 """
+from collections import defaultdict
 from typing import List, Dict, Any, Optional
 from datetime import datetime
 from .base import ReportGenerator, CommitData, TaskData, MetadataChanges
 from .constants import METADATA_ELEMENT_TYPES, TABLE_STYLES, STYLE_SETTINGS
+from .render_helpers import escape_html, metadata_element_fields
+
+# Заголовки таблиц с подставленными стилями, собираются один раз при импорте
+_TABLE_OPEN_TAG = '<table border="{}" style="border-collapse: {}; width: {};">'.format(
+    TABLE_STYLES['border'],
+    TABLE_STYLES['border_collapse'],
+    TABLE_STYLES['width']
+)
+_GENERAL_STATS_TABLE_HEADER = '''
+        <h2>Общая статистика</h2>
+        ''' + _TABLE_OPEN_TAG + '''
+            <tr>
+                <th>Показатель</th>
+                <th>Значение</th>
+            </tr>'''
+_COMMITS_TABLE_HEADER = '''
+        <h2>Коммиты по задачам</h2>
+        ''' + _TABLE_OPEN_TAG + '''
+            <tr>
+                <th>Задача</th>
+                <th>Автор</th>
+                <th>Статус</th>
+                <th>Строк кода</th>
+                <th>Сообщение коммита</th>
+                <th>Задача интрасервис</th>
+                <th>Страницы Confluence</th>
+            </tr>
+        '''
+_AUTHOR_STATS_TABLE_HEADER = '''
+        <h2>Статистика авторов</h2>
+        ''' + _TABLE_OPEN_TAG + '''
+            <tr>
+                <th>Автор</th>
+                <th>Строк кода (Всего)</th>
+                <th>Количество коммитов</th>
+            </tr>
+        '''
+# Шаблоны строк таблиц, подставляются через str.format для каждой строки
+_COMMIT_ROW_TMPL = (
+    '<tr><td>{task_link}</td><td>{author}</td><td>{status}</td><td>{total_lines}</td>'
+    '<td>{commit_link}</td><td>{intraservice_html}</td><td>{confluence_pages_html}</td></tr>'
+)
+_AUTHOR_ROW_TMPL = '<tr><td>{author}</td><td>{total_lines}</td><td>{task_count}</td></tr>'
+_METADATA_ROW_TMPL = (
+    '<tr style="background-color: {bg};">'
+    '<td style="padding: 8px; font-weight: bold; color: {color};">{elem_type}</td>'
+    '<td style="padding: 8px;">{elem_name}</td>'
+    '<td style="padding: 8px; font-size: 0.9em; color: #6c757d;">{elem_path}</td>'
+    '<td style="padding: 8px; font-size: 0.9em;">{details_str}</td></tr>'
+)
 
 
 class ConfluenceReportGenerator(ReportGenerator):
@@ -14,6 +65,8 @@ class ConfluenceReportGenerator(ReportGenerator):
         self.gitlab_url = gitlab_url
         self.gitlab_group = gitlab_group
         self.gitlab_project = gitlab_project
+        # Общий префикс ссылок на коммиты
+        self._commit_url_prefix = f'{gitlab_url}/{gitlab_group}/{gitlab_project}/-/commit/'
     
     def generate(self, commits: List[CommitData], tasks: List[TaskData], 
                 metadata: Optional[MetadataChanges] = None) -> str:
@@ -25,8 +78,13 @@ class ConfluenceReportGenerator(ReportGenerator):
         # Статистика по авторам
         author_stats = self._calculate_author_stats(commits)
         
+        # Индекс задач по номеру для поиска за O(1); при повторах берется первая задача
+        tasks_by_number = {}
+        for task in tasks:
+            tasks_by_number.setdefault(task.task_number, task)
+        
         # Таблица коммитов по задачам
-        html += self._generate_commits_table(commits, tasks)
+        html += self._generate_commits_table(commits, tasks_by_number)
         
         # Общая статистика
         html += self._generate_general_stats(commits, tasks, metadata)
@@ -42,27 +100,19 @@ class ConfluenceReportGenerator(ReportGenerator):
     
     def _calculate_author_stats(self, commits: List[CommitData]) -> Dict[str, Dict[str, int]]:
         """Вычисляет статистику по авторам"""
-        author_stats = {}
+        author_stats = defaultdict(lambda: {'total_lines': 0, 'task_count': 0})
         for commit in commits:
-            author = commit.author
-            if author not in author_stats:
-                author_stats[author] = {'total_lines': 0, 'task_count': 0}
-            author_stats[author]['total_lines'] += commit.total_lines
+            stats = author_stats[commit.author]
+            stats['total_lines'] += commit.total_lines
             if commit.task_number:
-                author_stats[author]['task_count'] += 1
-        return author_stats
+                stats['task_count'] += 1
+        return dict(author_stats)
     
     def _generate_general_stats(self, commits: List[CommitData], tasks: List[TaskData], metadata: Optional[MetadataChanges] = None) -> str:
         """Генерирует общую статистику"""
         total_lines = sum(commit.total_lines for commit in commits)
         
-        html = '''
-        <h2>Общая статистика</h2>
-        <table border="{}" style="border-collapse: {}; width: {};">
-            <tr>
-                <th>Показатель</th>
-                <th>Значение</th>
-            </tr>
+        html = _GENERAL_STATS_TABLE_HEADER + '''
             <tr>
                 <td>Количество коммитов</td>
                 <td>{}</td>
@@ -76,9 +126,6 @@ class ConfluenceReportGenerator(ReportGenerator):
                 <td>{}</td>
             </tr>
         '''.format(
-            TABLE_STYLES['border'],
-            TABLE_STYLES['border_collapse'],
-            TABLE_STYLES['width'],
             len(commits),
             len(tasks),
             total_lines
@@ -112,28 +159,14 @@ class ConfluenceReportGenerator(ReportGenerator):
         html += '</table>'
         return html
     
-    def _generate_commits_table(self, commits: List[CommitData], tasks: List[TaskData]) -> str:
+    def _generate_commits_table(self, commits: List[CommitData], tasks_by_number: Dict[str, TaskData]) -> str:
         """Генерирует таблицу коммитов по задачам"""
-        html = '''
-        <h2>Коммиты по задачам</h2>
-        <table border="{}" style="border-collapse: {}; width: {};">
-            <tr>
-                <th>Задача</th>
-                <th>Автор</th>
-                <th>Статус</th>
-                <th>Строк кода</th>
-                <th>Сообщение коммита</th>
-                <th>Задача интрасервис</th>
-                <th>Страницы Confluence</th>
-            </tr>
-        '''.format(
-            TABLE_STYLES['border'],
-            TABLE_STYLES['border_collapse'],
-            TABLE_STYLES['width']
-        )
+        # Собираем фрагменты в список и склеиваем один раз в конце
+        parts = [_COMMITS_TABLE_HEADER]
+        parts_append = parts.append
         
         for commit in commits:
-            task_info = self._find_task_info(commit.task_number, tasks)
+            task_info = self._find_task_info(commit.task_number, tasks_by_number)
             status = self._format_status(task_info.get('status', 'Unknown'))
             confluence_pages_html = self._format_confluence_pages(task_info.get('confluence_pages', []))
             
@@ -150,48 +183,33 @@ class ConfluenceReportGenerator(ReportGenerator):
             task_link = self._format_task_link(commit.task_number)
             commit_link = self._format_commit_link(commit)
             
-            html += f'''
-            <tr>
-                <td>{task_link}</td>
-                <td>{commit.author}</td>
-                <td>{status}</td>
-                <td>{commit.total_lines}</td>
-                <td>{commit_link}</td>
-                <td>{intraservice_html}</td>
-                <td>{confluence_pages_html}</td>
-            </tr>
-            '''
+            parts_append(_COMMIT_ROW_TMPL.format(
+                task_link=task_link,
+                author=escape_html(commit.author),
+                status=status,
+                total_lines=commit.total_lines,
+                commit_link=commit_link,
+                intraservice_html=intraservice_html,
+                confluence_pages_html=confluence_pages_html
+            ))
         
-        html += '</table>'
-        return html
+        parts_append('</table>')
+        return ''.join(parts)
     
     def _generate_author_stats_table(self, author_stats: Dict[str, Dict[str, int]]) -> str:
         """Генерирует таблицу статистики авторов"""
-        html = '''
-        <h2>Статистика авторов</h2>
-        <table border="{}" style="border-collapse: {}; width: {};">
-            <tr>
-                <th>Автор</th>
-                <th>Строк кода (Всего)</th>
-                <th>Количество коммитов</th>
-            </tr>
-        '''.format(
-            TABLE_STYLES['border'],
-            TABLE_STYLES['border_collapse'],
-            TABLE_STYLES['width']
-        )
+        parts = [_AUTHOR_STATS_TABLE_HEADER]
+        parts_append = parts.append
         
         for author, stats in author_stats.items():
-            html += f'''
-            <tr>
-                <td>{author}</td>
-                <td>{stats['total_lines']}</td>
-                <td>{stats['task_count']}</td>
-            </tr>
-            '''
+            parts_append(_AUTHOR_ROW_TMPL.format(
+                author=escape_html(author),
+                total_lines=stats['total_lines'],
+                task_count=stats['task_count']
+            ))
         
-        html += '</table>'
-        return html
+        parts_append('</table>')
+        return ''.join(parts)
     
     def _generate_metadata_section(self, metadata: MetadataChanges) -> str:
         """Генерирует раздел метаданных"""
@@ -274,21 +292,21 @@ class ConfluenceReportGenerator(ReportGenerator):
         
         scheme = color_scheme.get(title, {"color": "#6c757d", "bg": "#f8f9fa", "icon": "📝"})
         
-        html = f'''
+        parts = [f'''
         <h3 style="color: {scheme['color']};">{scheme['icon']} {title} ({len(elements)})</h3>
-        <table border="{TABLE_STYLES['border']}" style="border-collapse: {TABLE_STYLES['border_collapse']}; width: {TABLE_STYLES['width']};">
+        {_TABLE_OPEN_TAG}
             <tr style="background-color: #e9ecef;">
                 <th style="padding: 8px;">Тип</th>
                 <th style="padding: 8px;">Имя</th>
                 <th style="padding: 8px;">Путь</th>
                 <th style="padding: 8px;">Детали</th>
             </tr>
-        '''
+        ''']
+        parts_append = parts.append
         
         for element in elements:
-            elem_type = METADATA_ELEMENT_TYPES.get(element.tag, element.tag)
-            elem_name = element.text if hasattr(element, 'text') else element.get('text', '')
-            elem_path = element.path if hasattr(element, 'path') else element.get('path', '')
+            elem_type, elem_name, elem_path, changes = metadata_element_fields(element)
+            elem_type = METADATA_ELEMENT_TYPES.get(elem_type, elem_type)
             
             # Дополнительная информация
             details = []
@@ -296,37 +314,38 @@ class ConfluenceReportGenerator(ReportGenerator):
                 details.append(f"Дочерних элементов: {element.children_count}")
             if hasattr(element, 'attributes') and element.attributes:
                 details.append(f"Атрибутов: {len(element.attributes)}")
-            if hasattr(element, 'changes') and element.changes:
-                details.append(f"Изменения: {', '.join(element.changes)}")
+            if changes:
+                details.append(f"Изменения: {', '.join(changes)}")
             
             details_str = "<br>".join(details) if details else "—"
             
-            html += f'''
-            <tr style="background-color: {scheme['bg']};">
-                <td style="padding: 8px; font-weight: bold; color: {scheme['color']};">{elem_type}</td>
-                <td style="padding: 8px;">{elem_name}</td>
-                <td style="padding: 8px; font-size: 0.9em; color: #6c757d;">{elem_path or '—'}</td>
-                <td style="padding: 8px; font-size: 0.9em;">{details_str}</td>
-            </tr>
-            '''
+            parts_append(_METADATA_ROW_TMPL.format(
+                bg=scheme['bg'],
+                color=scheme['color'],
+                elem_type=elem_type,
+                elem_name=elem_name,
+                elem_path=elem_path or '—',
+                details_str=details_str
+            ))
         
-        html += '</table>'
-        return html
+        parts_append('</table>')
+        return ''.join(parts)
     
-    def _find_task_info(self, task_number: Optional[str], tasks: List[TaskData]) -> Dict[str, Any]:
+    def _find_task_info(self, task_number: Optional[str], tasks_by_number: Dict[str, TaskData]) -> Dict[str, Any]:
         """Находит информацию о задаче по номеру"""
-        if not task_number or not tasks:
+        if not task_number:
             return {}
         
-        for task in tasks:
-            if task.task_number == task_number:
-                return {
-                    'status': task.status,
-                    'confluence_pages': task.confluence_pages or [],
-                    'intraservice_task': task.intraservice_task,
-                    'intraservice_task_url': task.intraservice_task_url
-                }
-        return {}
+        task = tasks_by_number.get(task_number)
+        if not task:
+            return {}
+        
+        return {
+            'status': task.status,
+            'confluence_pages': task.confluence_pages or [],
+            'intraservice_task': task.intraservice_task,
+            'intraservice_task_url': task.intraservice_task_url
+        }
     
     def _format_status(self, status: str) -> str:
         """Форматирует статус задачи"""
@@ -339,10 +358,11 @@ class ConfluenceReportGenerator(ReportGenerator):
         if not pages:
             return "Нет"
         
-        confluence_links = []
-        for page in pages:
-            confluence_links.append(f'<a href="{page["url"]}" target="_blank">{page["filename"]}</a>')
-        return '<br>'.join(confluence_links)
+        return '<br>'.join(
+            f'<a href="{escape_html(page["url"])}" target="_blank">'
+            f'{escape_html(page["filename"])}</a>'
+            for page in pages
+        )
     
     def _format_task_link(self, task_number: Optional[str]) -> str:
         """Форматирует ссылку на задачу"""
@@ -354,8 +374,10 @@ class ConfluenceReportGenerator(ReportGenerator):
     
     def _format_commit_link(self, commit: CommitData) -> str:
         """Форматирует ссылку на коммит"""
-        commit_url = f'{self.gitlab_url}/{self.gitlab_group}/{self.gitlab_project}/-/commit/{commit.id}'
-        message = commit.message[:500]
-        if len(commit.message) > 500:
-            message += "..."
+        commit_url = self._commit_url_prefix + commit.id
+        message = commit.message
+        if len(message) > 500:
+            message = escape_html(message[:500]) + "..."
+        else:
+            message = escape_html(message)
         return f'<a href="{commit_url}">{message}</a>'
@@ -1,11 +1,26 @@
 ﻿import os
+import requests
+from requests.adapters import HTTPAdapter
 from atlassian import Confluence
 from typing import List, Dict, Any
 from datetime import datetime
 from .config_manager import ConfigManager
+from .constants import CONFLUENCE_URL_RE
 import re
+from concurrent.futures import ThreadPoolExecutor
+
+# Шаблоны разбора ссылок Confluence, компилируются один раз
+_PAGEID_RE = re.compile(r'pageId=(\d+)')
+_DISPLAY_TITLE_RE = re.compile(r'/display/[^/]+/([^?]+)')
 
 class ConfluenceService:
+    # Размер пула соединений, общего для параллельных запросов
+    POOL_SIZE = 16
+    # Число ID страниц в одном CQL запросе
+    CQL_BATCH_SIZE = 100
+    # Число параллельных запросов страниц, не найденных CQL запросом
+    TITLE_FETCH_WORKERS = 8
+    
     def __init__(self, config_manager: ConfigManager):
         self.config_manager = config_manager
 
@@ -20,9 +35,16 @@ class ConfluenceService:
         if not all([self.confluence_url, self.confluence_email, self.confluence_token, self.space_key]):
             raise ValueError('Confluence configuration is missing')
         
+        # Одна сессия с пулом соединений для всех запросов к Confluence
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=self.POOL_SIZE, pool_maxsize=self.POOL_SIZE)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        
         self.confluence = Confluence(
             url=self.confluence_url,
-            token=self.confluence_token
+            token=self.confluence_token,
+            session=session
         )
     
     def create_report_page(self, commit_data: List[Dict], task_data: List[Dict], report_service=None, metadata_changes: Dict[str, Any] = None) -> str:
@@ -58,14 +80,15 @@ class ConfluenceService:
         try:
             # Извлекаем ID страницы из URL
             # URL обычно имеет формат: https://confluence.domain.com/pages/viewpage.action?pageId=123456
-            page_id_match = re.search(r'pageId=(\d+)', url)
+            page_id_match = _PAGEID_RE.search(url)
             if page_id_match:
                 page_id = page_id_match.group(1)
+                # Заголовки кэширует ConfluenceDataService, здесь страница запрашивается всегда
                 page = self.confluence.get_page_by_id(page_id, expand='version')
                 return page.get('title', 'Unknown Page')
             
             # Альтернативный формат URL: https://confluence.domain.com/display/SPACE/Page+Title
-            space_title_match = re.search(r'/display/[^/]+/([^?]+)', url)
+            space_title_match = _DISPLAY_TITLE_RE.search(url)
             if space_title_match:
                 page_title = space_title_match.group(1).replace('+', ' ')
                 return page_title
@@ -76,7 +99,41 @@ class ConfluenceService:
         except Exception as e:
             print(f'Error getting page title for URL {url}: {str(e)}')
             return 'Confluence Page'
-
+    
+    def get_titles_by_urls(self, urls: List[str]) -> Dict[str, str]:
+        """Получает заголовки страниц Confluence по списку URL пакетными CQL запросами"""
+        titles = {}
+        urls_by_page_id = {}
+        
+        for url in urls:
+            page_id_match = _PAGEID_RE.search(url)
+            if page_id_match:
+                urls_by_page_id.setdefault(page_id_match.group(1), []).append(url)
+                continue
+            
+            # Заголовок из URL вида /display/SPACE/Page+Title запрос не требует
+            space_title_match = _DISPLAY_TITLE_RE.search(url)
+            titles[url] = space_title_match.group(1).replace('+', ' ') if space_title_match else 'Confluence Page'
+        
+        page_ids = list(urls_by_page_id)
+        for start in range(0, len(page_ids), self.CQL_BATCH_SIZE):
+            batch = page_ids[start:start + self.CQL_BATCH_SIZE]
+            try:
+                response = self.confluence.get(
+                    'rest/api/content/search',
+                    params={'cql': f'id in ({",".join(batch)})', 'limit': len(batch)}
+                )
+                for page in (response or {}).get('results', []):
+                    page_id = str(page.get('id'))
+                    page_title = page.get('title', 'Unknown Page')
+                    for url in urls_by_page_id.get(page_id, []):
+                        titles[url] = page_title
+            except Exception as e:
+                # Не найденные здесь страницы запрашиваются по одной
+                print(f'Error getting page titles by CQL: {str(e)}')
+        
+        return titles
+    
     def _get_confluence_attachments(self, task_number: str, task_data: Dict) -> List[Dict[str, str]]:
         """Получает прикрепленные к задаче страницы Confluence"""
         try:
@@ -85,20 +142,18 @@ class ConfluenceService:
             # Ищем ссылки на Confluence в описании задачи
             description = task_data.get('description', '')
             if description:
-                import re
-                confluence_urls = []
-                for match in re.findall(r'https?://[^/]*confluence[^/]*/[^\s<>"\']*', description):
-                    # Обрезаем ссылку до pageId=число, если есть
-                    pageid_match = re.search(r'(pageId=\d+)', match)
-                    if pageid_match:
-                        trimmed_url = match[:match.find(pageid_match.group(1)) + len(pageid_match.group(1))]
-                        confluence_urls.append(trimmed_url)
-                    else:
-                        confluence_urls.append(match)
+                urls = CONFLUENCE_URL_RE.findall(description)
+                
+                # Заголовки получаем одним CQL запросом, оставшиеся - параллельно по одному
+                titles = self.get_titles_by_urls(list(dict.fromkeys(urls)))
+                missing_urls = [url for url in dict.fromkeys(urls) if url not in titles]
+                if missing_urls:
+                    with ThreadPoolExecutor(max_workers=min(self.TITLE_FETCH_WORKERS, len(missing_urls))) as executor:
+                        titles.update(zip(missing_urls, executor.map(self.get_page_title_by_url, missing_urls)))
                 
-                for url in confluence_urls:
+                for url in urls:
                     confluence_pages.append({
-                        'filename': self.get_page_title_by_url(url),
+                        'filename': titles[url],
                         'url': url,
                         'created': 'Unknown',
                         'author': 'Unknown'
@@ -108,12 +163,11 @@ class ConfluenceService:
             attachments = task_data.get('attachments', [])
             if attachments:
                 for attachment in attachments:
-                    if (attachment.get('filename', '').endswith('.html') or 
-                        attachment.get('filename', '').endswith('.htm') or
-                        'confluence' in attachment.get('filename', '').lower()):
-                        
+                    filename = attachment.get('filename', '') or ''
+                    filename_lower = filename.lower()
+                    if filename_lower.endswith(('.html', '.htm')) or 'confluence' in filename_lower:
                         confluence_pages.append({
-                            'filename': attachment.get('filename', 'Unknown'),
+                            'filename': filename or 'Unknown',
                             'url': attachment.get('url', ''),
                             'created': attachment.get('created', 'Unknown'),
                             'author': attachment.get('author', 'Unknown')
@@ -1,6 +1,7 @@
 """
 Константы для системы отчетов
 """
+import re
 
 # HTML константы
 HTML_TEMPLATES = {
@@ -43,9 +44,18 @@ METADATA_ELEMENT_TYPES = {
     '{http://v8.1c.ru/8.3/MDClasses}Constant': 'Константа',
 }
 
+# Ссылка на Confluence в тексте; ссылка сразу обрезается до pageId=число, если он есть
+CONFLUENCE_URL_RE = re.compile(
+    r'https?://[^/\s]*confluence[^/\s]*/[^\s<>"\']*?(?:pageId=\d+|(?=[\s<>"\']|$))'
+)
+
 # Пути к файлам
 FILE_PATHS = {
     'commits_file': 'commits',
+    # Каталог данных, которые приложение создает во время работы
+    'data_dir': 'data',
+    # Постоянный кэш заголовков страниц Confluence (относительно каталога данных)
+    'confluence_titles_cache': 'confluence_titles.db',
     'configuration_xml': 'src/cf/Configuration.xml',
 }
 
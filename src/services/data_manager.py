@@ -1,8 +1,12 @@
 """
 Менеджер данных для системы отчетов
 """
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
 import logging
+import os
+import threading
+from datetime import datetime
+from functools import cached_property
 from .base import BaseService, CommitData, TaskData, MetadataChanges, ServiceError
 from .validators import DataValidator
 from .gitlab_service import GitLabService
@@ -13,34 +17,78 @@ from .confluence_data_service import ConfluenceDataService
 from .constants import FILE_PATHS, MESSAGES
 
 
+class _locked_cached_property(cached_property):
+    """cached_property, вычисляющий значение под блокировкой экземпляра"""
+    
+    def __get__(self, instance, owner=None):
+        if instance is None:
+            return self
+        # Параллельные первые запросы не должны создавать дублирующие клиенты сервисов
+        with instance._services_lock:
+            return super().__get__(instance, owner)
+
+
+def _parse_commit_date(value: str) -> datetime:
+    """Разбирает дату коммита GitLab в формате ISO 8601, включая суффикс Z"""
+    if value.endswith('Z'):
+        return datetime.fromisoformat(value[:-1] + '+00:00')
+    return datetime.fromisoformat(value)
+
+
 class DataManager(BaseService):
     """Менеджер данных для отчетов"""
     
     def __init__(self, config_manager):
         super().__init__(config_manager)
         self.config_manager = config_manager
-        self.gitlab_service = GitLabService(config_manager)
-        self.metadata_service = MetadataService(config_manager)
         
         # Получаем путь к файлу коммитов из конфигурации приложения
         app_config = config_manager.get_app_config()
         self.commits_file = app_config.get('commits_file', FILE_PATHS['commits_file'])
+        # Последнее прочитанное значение файла коммитов и его (mtime, size)
+        self._last_commit_cache: Optional[Tuple[Tuple[int, int], Optional[str]]] = None
         
-        # Инициализируем сервис таск-трекеров
+        # Одиночный таск-трекер, сервисы создаются лениво при первом обращении
         self.task_service = None
-        self.multi_task_service = None
-        
+        # Блокировка ленивого создания сервисов (менеджер общий для потоков запросов)
+        self._services_lock = threading.RLock()
+    
+    @_locked_cached_property
+    def gitlab_service(self) -> GitLabService:
+        """Сервис GitLab"""
+        return GitLabService(self.config_manager)
+    
+    @_locked_cached_property
+    def metadata_service(self) -> MetadataService:
+        """Сервис анализа метаданных"""
+        return MetadataService(self.config_manager)
+    
+    @_locked_cached_property
+    def multi_task_service(self) -> Optional[MultiTrackerService]:
+        """Сервис таск-трекеров"""
         try:
-            self.multi_task_service = MultiTrackerService(config_manager)
-            self.logger.info(f"Initialized multi-task service with {len(self.multi_task_service.tracker_services)} trackers")
-                
+            multi_task_service = MultiTrackerService(self.config_manager)
+            self.logger.info("Initialized multi-task service with %d trackers", len(multi_task_service.tracker_services))
+            return multi_task_service
         except Exception as e:
-            self.logger.warning(f"Could not initialize task service: {str(e)}")
-            self.task_service = None
-            self.multi_task_service = None
-        
-        # Инициализируем сервис данных Confluence
-        self.confluence_data_service = ConfluenceDataService(config_manager)
+            self.logger.warning("Could not initialize task service: %s", e)
+            return None
+    
+    @_locked_cached_property
+    def confluence_data_service(self) -> ConfluenceDataService:
+        """Сервис данных Confluence"""
+        return ConfluenceDataService(self.config_manager)
+    
+    @_locked_cached_property
+    def _jira_service_for_confluence(self):
+        """JiraService для обогащения данными Confluence, определяется один раз"""
+        if not self.multi_task_service:
+            return None
+        return next(
+            (tracker_info['service'] for tracker_info in self.multi_task_service.tracker_services.values()
+             if tracker_info['type'].value == 'jira'),
+            None
+        )
     
     def get_report_data(self, last_commit: Optional[str] = None) -> Dict[str, Any]:
         """Получает все данные для отчета"""
@@ -114,51 +162,51 @@ class DataManager(BaseService):
             return DataValidator.validate_commit_data(commits)
             
         except Exception as e:
-            self.logger.error(f"Error getting commits data: {str(e)}")
+            self.logger.error("Error getting commits data: %s", e)
             raise ServiceError(f"Failed to get commits data: {str(e)}")
     
     def _get_commits_data_with_date_filter(self, last_commit: Optional[str] = None, report_date = None) -> List[CommitData]:
         """Получает данные коммитов с фильтрацией по дате формирования"""
         try:
-            from datetime import datetime
+            # Если дата формирования не указана, берем все коммиты с даты last_commit без фильтрации
+            if not report_date:
+                commits = self.gitlab_service.get_commits_since(last_commit)
+                if not commits:
+                    return []
+                return DataValidator.validate_commit_data(commits)
             
-            # Получаем все коммиты с даты last_commit
-            commits = self.gitlab_service.get_commits_since(last_commit)
-            if not commits:
-                return []
-            
-            # Если указана дата формирования отчета, фильтруем коммиты
-            if report_date:
-                filtered_commits = []
-                for commit in commits:
-                    try:
-                        # Парсим дату коммита
-                        commit_date = datetime.fromisoformat(commit['date'].replace('Z', '+00:00'))
-                        
-                        # Оставляем только коммиты до указанной даты формирования
-                        if commit_date <= report_date:
-                            filtered_commits.append(commit)
-                    except Exception as e:
-                        self.logger.warning(f"Could not parse commit date: {commit.get('date')}, error: {str(e)}")
-                        # Если не можем распарсить дату, включаем коммит
-                        filtered_commits.append(commit)
+            # Фильтруем коммиты по мере постраничной загрузки
+            filtered_commits = []
+            for commit in self.gitlab_service.iter_commits_since(last_commit):
+                date_value = commit.get('date')
+                # Коммиты без даты в формате ISO включаем без попытки разбора
+                if not isinstance(date_value, str) or len(date_value) < 10:
+                    filtered_commits.append(commit)
+                    continue
                 
-                commits = filtered_commits
+                try:
+                    # Парсим дату коммита
+                    commit_date = _parse_commit_date(date_value)
+                    
+                    # Оставляем только коммиты до указанной даты формирования
+                    if commit_date <= report_date:
+                        filtered_commits.append(commit)
+                except Exception as e:
+                    self.logger.warning("Could not parse commit date: %s, error: %s", date_value, e)
+                    # Если не можем распарсить дату, включаем коммит
+                    filtered_commits.append(commit)
             
-            return DataValidator.validate_commit_data(commits)
+            return DataValidator.validate_commit_data(filtered_commits)
             
         except Exception as e:
-            self.logger.error(f"Error getting commits data with date filter: {str(e)}")
+            self.logger.error("Error getting commits data with date filter: %s", e)
             raise ServiceError(f"Failed to get commits data with date filter: {str(e)}")
     
     def _get_tasks_data(self, commits: List[CommitData]) -> List[TaskData]:
         """Получает данные задач"""
         try:
             # Извлекаем номера задач из коммитов
-            task_numbers = list(set([
-                commit.task_number for commit in commits 
-                if commit.task_number
-            ]))
+            task_numbers = list({commit.task_number for commit in commits if commit.task_number})
             
             if not task_numbers:
                 return []
@@ -167,11 +215,11 @@ class DataManager(BaseService):
             if self.multi_task_service:
                 # Используем множественные трекеры
                 task_details = self.multi_task_service.get_task_details(task_numbers)
-                self.logger.info(f"Found {len(task_details)} tasks using multi-tracker service")
+                self.logger.info("Found %d tasks using multi-tracker service", len(task_details))
             elif self.task_service:
                 # Используем одиночный трекер
                 task_details = self.task_service.get_task_details(task_numbers)
-                self.logger.info(f"Found {len(task_details)} tasks using single tracker service")
+                self.logger.info("Found %d tasks using single tracker service", len(task_details))
             else:
                 self.logger.warning(MESSAGES['warning_no_task_service'])
                 return []
@@ -188,7 +236,7 @@ class DataManager(BaseService):
             return DataValidator.validate_task_data(enriched_task_details)
             
         except Exception as e:
-            self.logger.error(f"Error getting tasks data: {str(e)}")
+            self.logger.error("Error getting tasks data: %s", e)
             raise ServiceError(f"Failed to get tasks data: {str(e)}")
     
     def _get_metadata_data(self, commits: List[CommitData]) -> Optional[MetadataChanges]:
@@ -199,7 +247,7 @@ class DataManager(BaseService):
             if commits:
                 last_commit_date = commits[0].date
             
-            self.logger.info(f"Analyzing metadata changes since: {last_commit_date}")
+            self.logger.info("Analyzing metadata changes since: %s", last_commit_date)
             metadata_changes = self.metadata_service.analyze_metadata_changes(last_commit_date)
             
             if not metadata_changes:
@@ -207,38 +255,55 @@ class DataManager(BaseService):
                 return None
                 
             if not metadata_changes.get('has_changes', False):
-                self.logger.info(f"Metadata analysis result: {metadata_changes.get('message', 'No changes')}")
+                self.logger.info("Metadata analysis result: %s", metadata_changes.get('message', 'No changes'))
                 return None
             
-            self.logger.info(f"Metadata changes found: {metadata_changes.get('summary', {})}")
+            self.logger.info("Metadata changes found: %s", metadata_changes.get('summary', {}))
             return DataValidator.validate_metadata_changes(metadata_changes)
             
         except Exception as e:
-            self.logger.warning(f"{MESSAGES['warning_metadata_analysis']}: {str(e)}")
+            self.logger.warning("%s: %s", MESSAGES['warning_metadata_analysis'], e)
             return None
     
     def get_last_commit(self) -> Optional[str]:
         """Получает последний обработанный коммит"""
         try:
-            if not self._file_exists(self.commits_file):
+            try:
+                stat = os.stat(self.commits_file)
+            except FileNotFoundError:
                 return None
             
+            # Перечитываем файл, только если он изменился с прошлого чтения
+            file_key = (stat.st_mtime_ns, stat.st_size)
+            if self._last_commit_cache and self._last_commit_cache[0] == file_key:
+                return self._last_commit_cache[1]
+            
             with open(self.commits_file, 'r', encoding='utf-8') as f:
-                commit = f.read().strip()
-                return commit if commit else None
+                commit = f.read().strip() or None
+            
+            self._last_commit_cache = (file_key, commit)
+            return commit
                 
         except Exception as e:
-            self.logger.error(f"Error reading last commit: {str(e)}")
+            self.logger.error("Error reading last commit: %s", e)
             return None
     
     def save_last_commit(self, commit_hash: str) -> None:
         """Сохраняет последний обработанный коммит"""
+        tmp_path = self.commits_file + '.tmp'
         try:
-            with open(self.commits_file, 'w', encoding='utf-8') as f:
+            # Пишем во временный файл и подменяем атомарно, чтобы не оставить файл недописанным
+            with open(tmp_path, 'w', encoding='utf-8') as f:
                 f.write(commit_hash)
+            os.replace(tmp_path, self.commits_file)
+            
+            stat = os.stat(self.commits_file)
+            self._last_commit_cache = ((stat.st_mtime_ns, stat.st_size), commit_hash.strip() or None)
                 
         except Exception as e:
-            self.logger.error(f"Error saving last commit: {str(e)}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            self.logger.error("Error saving last commit: %s", e)
             raise ServiceError(f"Failed to save last commit: {str(e)}")
     
     def get_latest_commit(self) -> Optional[str]:
@@ -248,14 +313,9 @@ class DataManager(BaseService):
             return latest_commit.get('id') if latest_commit else None
             
         except Exception as e:
-            self.logger.error(f"Error getting latest commit: {str(e)}")
+            self.logger.error("Error getting latest commit: %s", e)
             return None
     
-    def _file_exists(self, file_path: str) -> bool:
-        """Проверяет существование файла"""
-        import os
-        return os.path.exists(file_path)
-    
     def get_ready_tasks(self, tasks: List[TaskData]) -> List[str]:
         """Получает список номеров задач со статусом 'Готово'"""
         ready_tasks = []
@@ -266,12 +326,4 @@ class DataManager(BaseService):
     
     def _get_jira_service_for_confluence(self):
         """Получает JiraService для обогащения данными Confluence"""
-        if not self.multi_task_service:
-            return None
-        
-        # Ищем JiraService среди трекеров
-        for tracker_name, tracker_info in self.multi_task_service.tracker_services.items():
-            if tracker_info['type'].value == 'jira':
-                return tracker_info['service']
-        
-        return None
+        return self._jira_service_for_confluence
@@ -1,9 +1,12 @@
 ﻿import gitlab
 import os
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterator
 import re
 from .config_manager import ConfigManager
 
+# Номер задачи в начале сообщения коммита: ABC-123, #123 или 123
+_TASK_RE = re.compile(r'(?:([A-Z]+-\d+)|#(\d+)|(\d+))')
+
 class GitLabService:
     def __init__(self, config_service: ConfigManager):
         self.config_service = config_service
@@ -18,41 +21,55 @@ class GitLabService:
         
         self.gl = gitlab.Gitlab(self.gitlab_url, private_token=self.gitlab_token, ssl_verify=False)
         self.project = self.gl.projects.get(self.project_id)
+        # Префикс ссылок на коммиты проекта
+        self._commit_url_prefix = f'{self.gitlab_url}/{self.project.path_with_namespace}/-/commit/'
     
     def get_commits_since(self, since_commit: str = None) -> List[Dict[str, Any]]:
+        return list(self.iter_commits_since(since_commit))
+    
+    def iter_commits_since(self, since_commit: str = None) -> Iterator[Dict[str, Any]]:
+        """Постранично загружает коммиты и отдает их по одному, не держа весь список в памяти"""
         try:
-            commits = self.project.commits.list(all=True, since=since_commit)
-            commit_data = []
-            for commit in commits:
-                commit_detail = self.project.commits.get(commit.id)
-                stats = commit_detail.stats
-                task_number = self._extract_task_number(commit.message)
-                
-                # Формируем URL коммита
-                commit_url = f'{self.gitlab_url}/{self.project.path_with_namespace}/-/commit/{commit.id}'
-                
-                commit_info = {
-                    'id': commit.id,
-                    'author': commit.author_name,
-                    'message': commit.message,
-                    'date': commit.created_at,
-                    'task_number': task_number,
-                    'additions': stats.get('additions', 0),
-                    'deletions': stats.get('deletions', 0),
-                    'total': stats.get('total', 0),
-                    'url': commit_url
-                }
-                commit_data.append(commit_info)
-            return commit_data
+            # Статистика приходит вместе со списком, отдельный запрос на каждый коммит не нужен
+            commits = self.project.commits.list(
+                iterator=True,
+                since=since_commit,
+                with_stats=True,
+                per_page=100
+            )
+            yield from map(self._build_commit_info, commits)
         except Exception as e:
             raise Exception(f'Error fetching commits: {str(e)}')
     
+    def _build_commit_info(self, commit) -> Dict[str, Any]:
+        """Формирует словарь с данными коммита из объекта GitLab"""
+        stats = getattr(commit, 'stats', None) or {}
+        commit_id = commit.id
+        return {
+            'id': commit_id,
+            'author': commit.author_name,
+            'message': commit.message,
+            'date': commit.created_at,
+            'task_number': self._extract_task_number(commit.message),
+            'additions': stats.get('additions', 0),
+            'deletions': stats.get('deletions', 0),
+            'total': stats.get('total', 0),
+            'url': self._commit_url_prefix + commit_id
+        }
+    
     def _extract_task_number(self, message: str) -> str:
-        patterns = [r'^([A-Z]+-\d+)', r'^#(\d+)', r'^(\d+)']
-        for pattern in patterns:
-            match = re.search(pattern, message.strip())
-            if match:
-                return match.group(1)
+        message = message.lstrip()
+        if not message:
+            return None
+        
+        # Номер задачи может начинаться только с заглавной буквы, '#' или цифры
+        first_char = message[0]
+        if not ('A' <= first_char <= 'Z' or first_char == '#' or first_char.isdigit()):
+            return None
+        
+        match = _TASK_RE.match(message)
+        if match:
+            return next(group for group in match.groups() if group)
         return None
     
     def get_latest_commit(self) -> str:
@@ -75,6 +92,36 @@ class GitLabService:
         Returns:
             Словарь с информацией об изменениях файла
         """
+        try:
+            # Два последних коммита, изменивших файл, получаем одним запросом
+            touching = self.project.commits.list(
+                path=file_path,
+                since=since_commit_date,
+                order_by='created_at',
+                sort='desc',
+                per_page=2,
+                get_all=False
+            )
+            
+            if touching:
+                current_commit = touching[0]
+                since_commit = touching[1] if len(touching) > 1 else touching[-1]
+                return {
+                    'has_changes': True,
+                    'since_commit_id': since_commit.id,
+                    'current_commit_id': current_commit.id,
+                    'since_commit_date': since_commit.created_at,
+                    'current_commit_date': current_commit.created_at
+                }
+            
+            # Если по пути ничего не найдено, проверяем коммиты по одному
+            return self._scan_file_changes_since(file_path, since_commit_date)
+            
+        except Exception as e:
+            raise Exception(f'Error getting file changes since {since_commit_date}: {str(e)}')
+    
+    def _scan_file_changes_since(self, file_path: str, since_commit_date: str = None) -> Dict[str, Any]:
+        """Ищет изменения файла, проверяя наличие файла в каждом коммите с указанной даты"""
         try:
             # Получаем коммиты с указанной даты
             commits = self.project.commits.list(
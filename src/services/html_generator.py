@@ -1,51 +1,18 @@
 """
 Генератор HTML отчетов
 """
-from typing import List, Optional
+from functools import lru_cache
+from io import StringIO
+from typing import Dict, Iterator, List, Optional
 from datetime import datetime
+from jinja2 import Environment, DictLoader
+from markupsafe import Markup
 from .base import ReportGenerator, CommitData, TaskData, MetadataChanges
 from .constants import HTML_TEMPLATES, CSS_CLASSES, METADATA_ELEMENT_TYPES, MESSAGES, STYLE_SETTINGS
+from .render_helpers import escape_html, metadata_element_fields
 
-
-class HTMLReportGenerator(ReportGenerator):
-    """Генератор HTML отчетов"""
-    
-    def generate(self, commits: List[CommitData], tasks: List[TaskData], 
-                metadata: Optional[MetadataChanges] = None) -> str:
-        """Генерирует HTML отчет"""
-        return self._generate_full_html_report(commits, tasks, metadata)
-    
-    def _generate_full_html_report(self, commits: List[CommitData], tasks: List[TaskData], 
-                                 metadata: Optional[MetadataChanges] = None) -> str:
-        """Генерирует полный HTML отчет"""
-        html = f"""
-        {HTML_TEMPLATES['DOCTYPE']}
-        <html lang="ru">
-        <head>
-            {HTML_TEMPLATES['META_CHARSET']}
-            {HTML_TEMPLATES['META_VIEWPORT']}
-            <title>Отчет о релизе - {datetime.now().strftime('%d.%m.%Y %H:%M')}</title>
-            {self._generate_css_styles()}
-        </head>
-        <body>
-            <div class="{CSS_CLASSES['container']}">
-                {self._generate_header()}
-                <div class="{CSS_CLASSES['content']}">
-                    {self._generate_stats_section(commits, tasks, metadata)}
-                    {self._generate_commits_section(commits, tasks)}
-                    {self._generate_tasks_section(tasks)}
-                    {self._generate_metadata_section(metadata) if metadata and metadata.has_changes else self._generate_metadata_debug_info(metadata)}
-                </div>
-                {self._generate_footer()}
-            </div>
-        </body>
-        </html>
-        """
-        return html
-    
-    def _generate_css_styles(self) -> str:
-        """Генерирует CSS стили"""
-        return """
+# Стили отчета, статичны и создаются один раз при импорте
+_CSS_STYLES = Markup("""
         <style>
             body {
                 font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif;
@@ -227,107 +194,352 @@ class HTMLReportGenerator(ReportGenerator):
                 padding: 40px;
             }
         </style>
+        """)
+
+# Каркас отчета и статичные секции; готовые фрагменты секций передаются как Markup
+_REPORT_TMPL = """
+        {{ html.DOCTYPE }}
+        <html lang="ru">
+        <head>
+            {{ html.META_CHARSET }}
+            {{ html.META_VIEWPORT }}
+            <title>Отчет о релизе - {{ now.strftime('%d.%m.%Y %H:%M') }}</title>
+            {{ css }}
+        </head>
+        <body>
+            <div class="{{ css_classes.container }}">
+                {{ header }}
+                <div class="{{ css_classes.content }}">
+                    {{ stats }}
+                    {% for fragment in commits_section %}{{ fragment }}{% endfor %}
+                    {% for fragment in tasks_section %}{{ fragment }}{% endfor %}
+                    {{ metadata_section }}
+                </div>
+                {{ footer }}
+            </div>
+        </body>
+        </html>
         """
-    
-    def _generate_header(self) -> str:
-        """Генерирует заголовок отчета"""
-        return f"""
-        <div class="{CSS_CLASSES['header']}">
+
+_HEADER_TMPL = """
+        <div class="{{ css_classes.header }}">
             <h1>📊 Отчет о релизе</h1>
-            <div class="subtitle">Сформирован {datetime.now().strftime('%d.%m.%Y в %H:%M')}</div>
+            <div class="subtitle">Сформирован {{ now.strftime('%d.%m.%Y в %H:%M') }}</div>
         </div>
         """
-    
-    def _generate_stats_section(self, commits: List[CommitData], tasks: List[TaskData], metadata: Optional[MetadataChanges] = None) -> str:
-        """Генерирует секцию статистики"""
-        stats_html = f"""
-        <div class="{CSS_CLASSES['stats']}">
-            <div class="{CSS_CLASSES['stat_card']}">
-                <div class="{CSS_CLASSES['stat_number']}">{len(commits)}</div>
-                <div class="{CSS_CLASSES['stat_label']}">Коммитов</div>
+
+_STATS_TMPL = """
+        <div class="{{ css_classes.stats }}">
+            <div class="{{ css_classes.stat_card }}">
+                <div class="{{ css_classes.stat_number }}">{{ commits_count }}</div>
+                <div class="{{ css_classes.stat_label }}">Коммитов</div>
+            </div>
+            <div class="{{ css_classes.stat_card }}">
+                <div class="{{ css_classes.stat_number }}">{{ tasks_count }}</div>
+                <div class="{{ css_classes.stat_label }}">Задач</div>
             </div>
-            <div class="{CSS_CLASSES['stat_card']}">
-                <div class="{CSS_CLASSES['stat_number']}">{len(tasks)}</div>
-                <div class="{CSS_CLASSES['stat_label']}">Задач</div>
+        {% if metadata_changes is not none %}
+            <div class="{{ css_classes.stat_card }}">
+                <div class="{{ css_classes.stat_number }}">{{ metadata_changes }}</div>
+                <div class="{{ css_classes.stat_label }}">Изменений метаданных</div>
             </div>
+        {% endif %}
+        </div>
         """
-        
-        # Добавляем статистику метаданных, если есть изменения
-        if metadata and metadata.has_changes and metadata.summary:
-            total_metadata_changes = (metadata.summary.get('total_added', 0) + 
-                                    metadata.summary.get('total_removed', 0) + 
-                                    metadata.summary.get('total_modified', 0))
-            
-            stats_html += f"""
-            <div class="{CSS_CLASSES['stat_card']}">
-                <div class="{CSS_CLASSES['stat_number']}">{total_metadata_changes}</div>
-                <div class="{CSS_CLASSES['stat_label']}">Изменений метаданных</div>
+
+_METADATA_DEBUG_TMPL = """
+            <div class="{{ css_classes.section }}">
+                <h2>📋 Изменения метаданных подсистемы</h2>
+                <div class="{{ css_classes.commits_list }}">
+                    <div class="{{ css_classes.commit_item }}">
+                        <div class="{{ css_classes.commit_message }}" style="color: #6c757d;">{{ message }}</div>
+                    </div>
+                </div>
             </div>
             """
-        
-        stats_html += """
+
+_FOOTER_TMPL = """
+        <div class="{{ css_classes.footer }}">
+            <p>{{ messages.report_generated }}</p>
         </div>
         """
-        return stats_html
+
+_EMPTY_REPORT_TMPL = """
+        {{ html.DOCTYPE }}
+        <html lang="ru">
+        <head>
+            {{ html.META_CHARSET }}
+            <title>Отчет о релизе</title>
+            <style>
+                body { font-family: Arial, sans-serif; padding: 40px; text-align: center; background: #f5f5f5; }
+                .container { background: white; padding: 40px; border-radius: 10px; max-width: 600px; margin: 0 auto; }
+                .icon { font-size: 4rem; margin-bottom: 20px; }
+                .message { color: #666; font-size: 1.2rem; }
+            </style>
+        </head>
+        <body>
+            <div class="container">
+                <div class="icon">📊</div>
+                <div class="message">{{ message }}</div>
+            </div>
+        </body>
+        </html>
+        """
+
+_ERROR_REPORT_TMPL = """
+        {{ html.DOCTYPE }}
+        <html lang="ru">
+        <head>
+            {{ html.META_CHARSET }}
+            <title>Ошибка формирования отчета</title>
+            <style>
+                body { font-family: Arial, sans-serif; padding: 40px; text-align: center; background: #f5f5f5; }
+                .container { background: #f8d7da; color: #721c24; padding: 40px; border-radius: 10px; max-width: 600px; margin: 0 auto; border: 1px solid #f5c6cb; }
+                .icon { font-size: 4rem; margin-bottom: 20px; }
+                .message { font-size: 1.2rem; }
+            </style>
+        </head>
+        <body>
+            <div class="container">
+                <div class="icon">⚠️</div>
+                <div class="message">{{ error_message }}</div>
+            </div>
+        </body>
+        </html>
+        """
+
+# Шаблоны элементов списков коммитов и задач; CSS-классы подставлены один раз при импорте
+_COMMIT_LINKED_TMPL = """
+                    <a href="{{url}}" target="_blank" class="commit-item-link">
+                        <div class="{commit_item}">
+                            <div class="{commit_hash}">{{short_id}}</div>
+                            <div class="{commit_message}">{{message}}</div>
+                            <div class="{commit_meta}">
+                                Автор: {{author}} | 
+                                Дата: {{date}}
+                                {{task_link_html}}
+                            </div>
+                        </div>
+                    </a>
+                    """.format(**CSS_CLASSES)
+_COMMIT_PLAIN_TMPL = """
+                    <div class="{commit_item}">
+                        <div class="{commit_hash}">{{short_id}}</div>
+                        <div class="{commit_message}">{{message}}</div>
+                        <div class="{commit_meta}">
+                            Автор: {{author}} | 
+                            Дата: {{date}}
+                            {{task_link_html}}
+                        </div>
+                    </div>
+                    """.format(**CSS_CLASSES)
+_TASK_LINKED_TMPL = """
+                    <a href="{{url}}" target="_blank" class="task-item-link">
+                        <div class="{task_item}">
+                            <div class="{task_title}">{{summary}}</div>
+                            <div class="{task_description}">{{description}}</div>
+                            <div class="{task_meta}">
+                                ID: {{task_number}} | 
+                                Статус: {{status}} | 
+                                Приоритет: {{priority}}
+                                {{intraservice_info}}
+                            </div>
+                        </div>
+                    </a>
+                    """.format(**CSS_CLASSES)
+_TASK_PLAIN_TMPL = """
+                    <div class="{task_item}">
+                        <div class="{task_title}">{{summary}}</div>
+                        <div class="{task_description}">{{description}}</div>
+                        <div class="{task_meta}">
+                            ID: {{task_number}} | 
+                            Статус: {{status}} | 
+                            Приоритет: {{priority}}
+                            {{intraservice_info}}
+                        </div>
+                    </div>
+                    """.format(**CSS_CLASSES)
+
+# Шаблоны группы элементов метаданных и отдельного элемента; цвет задает тип изменения
+_METADATA_GROUP_OPEN_TMPL = """
+            <div class="{commit_item}">
+                <div class="{commit_message}" style="color: {{color}};">{{title}} ({{count}})</div>
+                <div class="{commit_meta}">
+            """.format(**CSS_CLASSES)
+_METADATA_GROUP_CLOSE = """
+                </div>
+            </div>
+            """
+_METADATA_ELEMENT_TMPL = """
+                <div style="margin: 8px 0; padding: 8px; background: #f8f9fa; border-radius: 4px; border-left: 3px solid {color};">
+                    <div style="font-weight: 600; color: {color};">{elem_type}</div>
+                    <div style="color: #333;">{elem_name}</div>
+                    {path_html}
+                    {changes_html}
+                </div>"""
+
+# Шаблоны компилируются один раз при импорте модуля
+_TEMPLATE_ENV = Environment(
+    loader=DictLoader({
+        'report.html': _REPORT_TMPL,
+        'header.html': _HEADER_TMPL,
+        'stats.html': _STATS_TMPL,
+        'metadata_debug.html': _METADATA_DEBUG_TMPL,
+        'footer.html': _FOOTER_TMPL,
+        'empty_report.html': _EMPTY_REPORT_TMPL,
+        'error_report.html': _ERROR_REPORT_TMPL,
+    }),
+    autoescape=True,
+    trim_blocks=True,
+    lstrip_blocks=True
+)
+_TEMPLATE_ENV.globals.update(
+    html={key: Markup(value) for key, value in HTML_TEMPLATES.items()},
+    css_classes=CSS_CLASSES,
+    messages=MESSAGES
+)
+_REPORT_TEMPLATE = _TEMPLATE_ENV.get_template('report.html')
+_HEADER_TEMPLATE = _TEMPLATE_ENV.get_template('header.html')
+_STATS_TEMPLATE = _TEMPLATE_ENV.get_template('stats.html')
+_METADATA_DEBUG_TEMPLATE = _TEMPLATE_ENV.get_template('metadata_debug.html')
+# Подвал не зависит от данных отчета и рендерится один раз
+_FOOTER_HTML = Markup(_TEMPLATE_ENV.get_template('footer.html').render())
+_EMPTY_REPORT_TEMPLATE = _TEMPLATE_ENV.get_template('empty_report.html')
+_ERROR_REPORT_TEMPLATE = _TEMPLATE_ENV.get_template('error_report.html')
+
+
+# Страницы пустого отчета и ошибки часто повторяются с тем же текстом, поэтому кэшируются
+@lru_cache(maxsize=64)
+def _build_empty_report(message: str) -> str:
+    """Рендерит страницу пустого отчета"""
+    return _EMPTY_REPORT_TEMPLATE.render(message=message)
+
+
+@lru_cache(maxsize=64)
+def _build_error_report(error_message: str) -> str:
+    """Рендерит страницу ошибки"""
+    return _ERROR_REPORT_TEMPLATE.render(error_message=error_message)
+
+
+class HTMLReportGenerator(ReportGenerator):
+    """Генератор HTML отчетов"""
     
-    def _generate_commits_section(self, commits: List[CommitData], tasks: List[TaskData]) -> str:
-        """Генерирует секцию коммитов"""
-        html = f"""
+    def generate(self, commits: List[CommitData], tasks: List[TaskData], 
+                metadata: Optional[MetadataChanges] = None) -> str:
+        """Генерирует HTML отчет"""
+        return self._generate_full_html_report(commits, tasks, metadata)
+    
+    def generate_iter(self, commits: List[CommitData], tasks: List[TaskData], 
+                      metadata: Optional[MetadataChanges] = None) -> Iterator[str]:
+        """Генерирует HTML отчет по фрагментам, не собирая разделы коммитов и задач в промежуточные строки"""
+        if metadata and metadata.has_changes:
+            metadata_section = self._generate_metadata_section(metadata)
+        else:
+            metadata_section = self._generate_metadata_debug_info(metadata)
+        
+        # Одно время формирования для заголовка страницы и шапки отчета
+        now = datetime.now()
+        
+        # Коммиты и задачи отдаются по одному элементу, не собираясь в общую строку
+        return _REPORT_TEMPLATE.generate(
+            now=now,
+            css=self._generate_css_styles(),
+            header=Markup(self._generate_header(now)),
+            stats=Markup(self._generate_stats_section(commits, tasks, metadata)),
+            commits_section=map(Markup, self._iter_commits_section(commits, tasks)),
+            tasks_section=map(Markup, self._iter_tasks_section(tasks)),
+            metadata_section=Markup(metadata_section),
+            footer=self._generate_footer()
+        )
+    
+    def _generate_full_html_report(self, commits: List[CommitData], tasks: List[TaskData], 
+                                 metadata: Optional[MetadataChanges] = None) -> str:
+        """Генерирует полный HTML отчет"""
+        return ''.join(self.generate_iter(commits, tasks, metadata))
+    
+    def _generate_css_styles(self) -> str:
+        """Генерирует CSS стили"""
+        return _CSS_STYLES
+    
+    def _generate_header(self, now: Optional[datetime] = None) -> str:
+        """Генерирует заголовок отчета"""
+        return _HEADER_TEMPLATE.render(now=now or datetime.now())
+    
+    def _generate_stats_section(self, commits: List[CommitData], tasks: List[TaskData], metadata: Optional[MetadataChanges] = None) -> str:
+        """Генерирует секцию статистики"""
+        # Добавляем статистику метаданных, если есть изменения
+        metadata_changes = None
+        if metadata and metadata.has_changes and metadata.summary:
+            metadata_changes = (metadata.summary.get('total_added', 0) + 
+                                metadata.summary.get('total_removed', 0) + 
+                                metadata.summary.get('total_modified', 0))
+        
+        return _STATS_TEMPLATE.render(
+            commits_count=len(commits),
+            tasks_count=len(tasks),
+            metadata_changes=metadata_changes
+        )
+    
+    def _iter_commits_section(self, commits: List[CommitData], tasks: List[TaskData]) -> Iterator[str]:
+        """Генерирует секцию коммитов по фрагментам"""
+        yield f"""
         <div class="{CSS_CLASSES['section']}">
             <h2>📝 Коммиты</h2>
             <div class="{CSS_CLASSES['commits_list']}">
         """
         
         if commits:
+            # URL задач по номеру; при повторах номера побеждает первая задача в списке
+            task_url_by_number = {task.task_number: task.url for task in reversed(tasks) if task.task_number}
+            task_link_class = CSS_CLASSES['task_link']
             for commit in commits:
-                task_url = self._find_task_url(commit.task_number, tasks)
+                # Для коммитов без задачи поиск URL задачи не нужен
+                task_number = commit.task_number
+                task_url = None
+                if task_number:
+                    task_url = escape_html(self._find_task_url(task_number, task_url_by_number))
+                    task_number = escape_html(task_number)
                 
                 # Если есть URL коммита, делаем весь блок кликабельным
                 if commit.url:
                     task_link_html = ""
-                    if commit.task_number and task_url:
-                        task_link_html = f' | <a href="{task_url}" class="{CSS_CLASSES["task_link"]}" onclick="event.stopPropagation()">Задача: {commit.task_number}</a>'
-                    elif commit.task_number:
-                        task_link_html = f' | <span class="task-number">Задача: {commit.task_number}</span>'
+                    if task_number and task_url:
+                        task_link_html = f' | <a href="{task_url}" class="{task_link_class}" onclick="event.stopPropagation()">Задача: {task_number}</a>'
+                    elif task_number:
+                        task_link_html = f' | <span class="task-number">Задача: {task_number}</span>'
                     
-                    html += f"""
-                    <a href="{commit.url}" target="_blank" class="commit-item-link">
-                        <div class="{CSS_CLASSES['commit_item']}">
-                            <div class="{CSS_CLASSES['commit_hash']}">{commit.id[:8]}</div>
-                            <div class="{CSS_CLASSES['commit_message']}">{commit.message}</div>
-                            <div class="{CSS_CLASSES['commit_meta']}">
-                                Автор: {commit.author} | 
-                                Дата: {commit.date}
-                                {task_link_html}
-                            </div>
-                        </div>
-                    </a>
-                    """
+                    yield _COMMIT_LINKED_TMPL.format(
+                        url=escape_html(commit.url),
+                        short_id=escape_html(commit.id[:8]),
+                        message=escape_html(commit.message),
+                        author=escape_html(commit.author),
+                        date=escape_html(commit.date),
+                        task_link_html=task_link_html
+                    )
                 else:
                     # Если нет URL, отображаем как обычный блок
-                    html += f"""
-                    <div class="{CSS_CLASSES['commit_item']}">
-                        <div class="{CSS_CLASSES['commit_hash']}">{commit.id[:8]}</div>
-                        <div class="{CSS_CLASSES['commit_message']}">{commit.message}</div>
-                        <div class="{CSS_CLASSES['commit_meta']}">
-                            Автор: {commit.author} | 
-                            Дата: {commit.date}
-                            {f' | <a href="{task_url}" class="{CSS_CLASSES["task_link"]}">Задача: {commit.task_number}</a>' if commit.task_number else ''}
-                        </div>
-                    </div>
-                    """
+                    task_link_html = ""
+                    if task_number:
+                        task_link_html = f' | <a href="{task_url}" class="{task_link_class}">Задача: {task_number}</a>'
+                    
+                    yield _COMMIT_PLAIN_TMPL.format(
+                        short_id=escape_html(commit.id[:8]),
+                        message=escape_html(commit.message),
+                        author=escape_html(commit.author),
+                        date=escape_html(commit.date),
+                        task_link_html=task_link_html
+                    )
         else:
-            html += f'<div class="{CSS_CLASSES["no_data"]}">Нет коммитов для отображения</div>'
+            yield f'<div class="{CSS_CLASSES["no_data"]}">Нет коммитов для отображения</div>'
         
-        html += """
+        yield """
             </div>
         </div>
         """
-        return html
     
-    def _generate_tasks_section(self, tasks: List[TaskData]) -> str:
-        """Генерирует секцию задач"""
-        html = f"""
+    def _iter_tasks_section(self, tasks: List[TaskData]) -> Iterator[str]:
+        """Генерирует секцию задач по фрагментам"""
+        yield f"""
         <div class="{CSS_CLASSES['section']}">
             <h2>🎯 Задачи</h2>
             <div class="{CSS_CLASSES['tasks_list']}">
@@ -339,46 +551,27 @@ class HTMLReportGenerator(ReportGenerator):
                 intraservice_info = ""
                 if task.intraservice_task:
                     if task.intraservice_task_url:
-                        intraservice_info = f'<br><span class="intraservice-task">Задача интрасервис: <a href="{task.intraservice_task_url}" target="_blank">{task.intraservice_task}</a></span>'
+                        intraservice_info = f'<br><span class="intraservice-task">Задача интрасервис: <a href="{escape_html(task.intraservice_task_url)}" target="_blank">{escape_html(task.intraservice_task)}</a></span>'
                     else:
-                        intraservice_info = f'<br><span class="intraservice-task">Задача интрасервис: {task.intraservice_task}</span>'
+                        intraservice_info = f'<br><span class="intraservice-task">Задача интрасервис: {escape_html(task.intraservice_task)}</span>'
                 
-                if task.url:
-                    html += f"""
-                    <a href="{task.url}" target="_blank" class="task-item-link">
-                        <div class="{CSS_CLASSES['task_item']}">
-                            <div class="{CSS_CLASSES['task_title']}">{task.summary}</div>
-                            <div class="{CSS_CLASSES['task_description']}">{task.description}</div>
-                            <div class="{CSS_CLASSES['task_meta']}">
-                                ID: {task.task_number} | 
-                                Статус: {task.status} | 
-                                Приоритет: {task.priority}
-                                {intraservice_info}
-                            </div>
-                        </div>
-                    </a>
-                    """
-                else:
-                    html += f"""
-                    <div class="{CSS_CLASSES['task_item']}">
-                        <div class="{CSS_CLASSES['task_title']}">{task.summary}</div>
-                        <div class="{CSS_CLASSES['task_description']}">{task.description}</div>
-                        <div class="{CSS_CLASSES['task_meta']}">
-                            ID: {task.task_number} | 
-                            Статус: {task.status} | 
-                            Приоритет: {task.priority}
-                            {intraservice_info}
-                        </div>
-                    </div>
-                    """
+                task_tmpl = _TASK_LINKED_TMPL if task.url else _TASK_PLAIN_TMPL
+                yield task_tmpl.format(
+                    url=escape_html(task.url),
+                    summary=escape_html(task.summary),
+                    description=escape_html(task.description),
+                    task_number=escape_html(task.task_number),
+                    status=escape_html(task.status),
+                    priority=escape_html(task.priority),
+                    intraservice_info=intraservice_info
+                )
         else:
-            html += f'<div class="{CSS_CLASSES["no_data"]}">{MESSAGES["no_tasks"]}</div>'
+            yield f'<div class="{CSS_CLASSES["no_data"]}">{MESSAGES["no_tasks"]}</div>'
         
-        html += """
+        yield """
             </div>
         </div>
         """
-        return html
     
     def _generate_metadata_section(self, metadata: MetadataChanges) -> str:
         """Генерирует секцию метаданных"""
@@ -429,173 +622,64 @@ class HTMLReportGenerator(ReportGenerator):
     
     def _generate_metadata_details(self, metadata: MetadataChanges) -> str:
         """Генерирует детали изменений метаданных"""
-        html = ""
-        
-        # Добавленные элементы
-        if metadata.added_metadata:
-            html += f"""
-            <div class="{CSS_CLASSES['commit_item']}">
-                <div class="{CSS_CLASSES['commit_message']}" style="color: #28a745;">➕ Добавленные элементы ({len(metadata.added_metadata)})</div>
-                <div class="{CSS_CLASSES['commit_meta']}">
-            """
-            for element in metadata.added_metadata:
-                elem_type = METADATA_ELEMENT_TYPES.get(element['tag'], element['tag'])
-                elem_name = element.text if hasattr(element, 'text') else element.get('text', '')
-                elem_path = element.path if hasattr(element, 'path') else element.get('path', '')
-                html += f"""
-                <div style="margin: 8px 0; padding: 8px; background: #f8f9fa; border-radius: 4px; border-left: 3px solid #28a745;">
-                    <div style="font-weight: 600; color: #28a745;">{elem_type}</div>
-                    <div style="color: #333;">{elem_name}</div>
-                    {f'<div style="font-size: 0.9em; color: #6c757d;">Путь: {elem_path}</div>' if elem_path else ''}
-                </div>"""
-            html += """
-                </div>
-            </div>
-            """
-        
-        # Удаленные элементы
-        if metadata.removed_metadata:
-            html += f"""
-            <div class="{CSS_CLASSES['commit_item']}">
-                <div class="{CSS_CLASSES['commit_message']}" style="color: #dc3545;">➖ Удаленные элементы ({len(metadata.removed_metadata)})</div>
-                <div class="{CSS_CLASSES['commit_meta']}">
-            """
-            for element in metadata.removed_metadata:
-                elem_type = METADATA_ELEMENT_TYPES.get(element['tag'], element['tag'])
-                elem_name = element.text if hasattr(element, 'text') else element.get('text', '')
-                elem_path = element.path if hasattr(element, 'path') else element.get('path', '')
-                html += f"""
-                <div style="margin: 8px 0; padding: 8px; background: #f8f9fa; border-radius: 4px; border-left: 3px solid #dc3545;">
-                    <div style="font-weight: 600; color: #dc3545;">{elem_type}</div>
-                    <div style="color: #333;">{elem_name}</div>
-                    {f'<div style="font-size: 0.9em; color: #6c757d;">Путь: {elem_path}</div>' if elem_path else ''}
-                </div>"""
-            html += """
-                </div>
-            </div>
-            """
+        buf = StringIO()
         
-        # Измененные элементы
-        if metadata.modified_metadata:
-            html += f"""
-            <div class="{CSS_CLASSES['commit_item']}">
-                <div class="{CSS_CLASSES['commit_message']}" style="color: #ffc107;">✏️ Измененные элементы ({len(metadata.modified_metadata)})</div>
-                <div class="{CSS_CLASSES['commit_meta']}">
-            """
-            for element in metadata.modified_metadata:
-                elem_type = METADATA_ELEMENT_TYPES.get(element['tag'], element['tag'])
-                elem_name = element.text if hasattr(element, 'text') else element.get('text', '')
-                elem_path = element.path if hasattr(element, 'path') else element.get('path', '')
-                
-                # Показываем изменения, если они есть
-                changes_info = ""
-                if hasattr(element, 'changes') and element.changes:
-                    changes_info = f"<div style='font-size: 0.9em; color: #6c757d; margin-top: 4px;'>Изменения: {', '.join(element.changes)}</div>"
-                
-                html += f"""
-                <div style="margin: 8px 0; padding: 8px; background: #f8f9fa; border-radius: 4px; border-left: 3px solid #ffc107;">
-                    <div style="font-weight: 600; color: #ffc107;">{elem_type}</div>
-                    <div style="color: #333;">{elem_name}</div>
-                    {f'<div style="font-size: 0.9em; color: #6c757d;">Путь: {elem_path}</div>' if elem_path else ''}
-                    {changes_info}
-                </div>"""
-            html += """
-                </div>
-            </div>
-            """
+        # Добавленные, удаленные и измененные элементы
+        self._render_metadata_group(buf, metadata.added_metadata, '#28a745', '➕ Добавленные элементы')
+        self._render_metadata_group(buf, metadata.removed_metadata, '#dc3545', '➖ Удаленные элементы')
+        self._render_metadata_group(buf, metadata.modified_metadata, '#ffc107', '✏️ Измененные элементы')
         
-        return html
+        return buf.getvalue()
     
+    def _render_metadata_group(self, buf: StringIO, elements: List, color: str, title: str) -> None:
+        """Записывает в буфер группу элементов метаданных одного типа изменения"""
+        if not elements:
+            return
+        
+        buf.write(_METADATA_GROUP_OPEN_TMPL.format(color=color, title=title, count=len(elements)))
+        for element in elements:
+            tag, text, path, changes = metadata_element_fields(element)
+            elem_type = METADATA_ELEMENT_TYPES.get(tag, tag)
+            elem_name = escape_html(text)
+            elem_path = escape_html(path)
+            
+            # Показываем изменения, если они есть
+            changes_html = ""
+            if changes:
+                changes_html = f"<div style='font-size: 0.9em; color: #6c757d; margin-top: 4px;'>Изменения: {escape_html(', '.join(changes))}</div>"
+            
+            buf.write(_METADATA_ELEMENT_TMPL.format(
+                color=color,
+                elem_type=elem_type,
+                elem_name=elem_name,
+                path_html=f'<div style="font-size: 0.9em; color: #6c757d;">Путь: {elem_path}</div>' if elem_path else '',
+                changes_html=changes_html
+            ))
+        buf.write(_METADATA_GROUP_CLOSE)
     
     def _generate_metadata_debug_info(self, metadata: Optional[MetadataChanges]) -> str:
         """Генерирует отладочную информацию о метаданных"""
         if metadata is None:
-            return f"""
-            <div class="{CSS_CLASSES['section']}">
-                <h2>📋 Изменения метаданных подсистемы</h2>
-                <div class="{CSS_CLASSES['commits_list']}">
-                    <div class="{CSS_CLASSES['commit_item']}">
-                        <div class="{CSS_CLASSES['commit_message']}" style="color: #6c757d;">⚠️ Метаданные не анализировались (metadata is None)</div>
-                    </div>
-                </div>
-            </div>
-            """
+            return _METADATA_DEBUG_TEMPLATE.render(message='⚠️ Метаданные не анализировались (metadata is None)')
         elif not metadata.has_changes:
-            return f"""
-            <div class="{CSS_CLASSES['section']}">
-                <h2>📋 Изменения метаданных подсистемы</h2>
-                <div class="{CSS_CLASSES['commits_list']}">
-                    <div class="{CSS_CLASSES['commit_item']}">
-                        <div class="{CSS_CLASSES['commit_message']}" style="color: #6c757d;">ℹ️ Нет изменений в метаданных (has_changes=False)</div>
-                    </div>
-                </div>
-            </div>
-            """
+            return _METADATA_DEBUG_TEMPLATE.render(message='ℹ️ Нет изменений в метаданных (has_changes=False)')
         else:
             return ""
     
     def _generate_footer(self) -> str:
         """Генерирует подвал отчета"""
-        return f"""
-        <div class="{CSS_CLASSES['footer']}">
-            <p>{MESSAGES['report_generated']}</p>
-        </div>
-        """
+        return _FOOTER_HTML
     
-    def _find_task_url(self, task_number: Optional[str], tasks: List[TaskData]) -> str:
+    def _find_task_url(self, task_number: Optional[str], task_url_by_number: Dict[str, str]) -> str:
         """Находит URL задачи по номеру"""
-        if not task_number or not tasks:
+        if not task_number:
             return '#'
-        
-        for task in tasks:
-            if task.task_number == task_number:
-                return task.url
-        return '#'
+        return task_url_by_number.get(task_number, '#')
     
     def generate_empty_report(self, message: str) -> str:
         """Генерирует пустой отчет"""
-        return f"""
-        {HTML_TEMPLATES['DOCTYPE']}
-        <html lang="ru">
-        <head>
-            {HTML_TEMPLATES['META_CHARSET']}
-            <title>Отчет о релизе</title>
-            <style>
-                body {{ font-family: Arial, sans-serif; padding: 40px; text-align: center; background: #f5f5f5; }}
-                .container {{ background: white; padding: 40px; border-radius: 10px; max-width: 600px; margin: 0 auto; }}
-                .icon {{ font-size: 4rem; margin-bottom: 20px; }}
-                .message {{ color: #666; font-size: 1.2rem; }}
-            </style>
-        </head>
-        <body>
-            <div class="container">
-                <div class="icon">📊</div>
-                <div class="message">{message}</div>
-            </div>
-        </body>
-        </html>
-        """
+        return _build_empty_report(message)
     
     def generate_error_report(self, error_message: str) -> str:
         """Генерирует отчет с ошибкой"""
-        return f"""
-        {HTML_TEMPLATES['DOCTYPE']}
-        <html lang="ru">
-        <head>
-            {HTML_TEMPLATES['META_CHARSET']}
-            <title>Ошибка формирования отчета</title>
-            <style>
-                body {{ font-family: Arial, sans-serif; padding: 40px; text-align: center; background: #f5f5f5; }}
-                .container {{ background: #f8d7da; color: #721c24; padding: 40px; border-radius: 10px; max-width: 600px; margin: 0 auto; border: 1px solid #f5c6cb; }}
-                .icon {{ font-size: 4rem; margin-bottom: 20px; }}
-                .message {{ font-size: 1.2rem; }}
-            </style>
-        </head>
-        <body>
-            <div class="container">
-                <div class="icon">⚠️</div>
-                <div class="message">{error_message}</div>
-            </div>
-        </body>
-        </html>
-        """
+        return _build_error_report(error_message)
@@ -1,15 +1,80 @@
 ﻿import os
+import re
+import time
+import threading
 import requests
+from requests.adapters import HTTPAdapter
 import json
 import base64
+from concurrent.futures import ThreadPoolExecutor
 from jira import JIRA
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Tuple
 from .multi_tracker_models import (
     MultiTrackerConfig, TaskTrackerConfig, TaskSearchResult, 
     MultiTaskResult, TaskDeduplicationInfo, TaskTrackerType
 )
 
+# Ключ задачи Jira, допустимый в JQL запросе key in (...)
+_ISSUE_KEY_RE = re.compile(r'[A-Z][A-Z0-9_]*-\d+')
+# Ключи объекта Jira, по которым берется его читаемое представление (как в Resource.__str__)
+_READABLE_KEYS = ('displayName', 'key', 'name', 'value', 'id')
+
+
+def _readable_value(value: Any) -> str:
+    """Возвращает читаемое строковое значение поля Jira из исходного JSON"""
+    if isinstance(value, dict):
+        for key in _READABLE_KEYS:
+            if key in value:
+                return str(value[key])
+    return str(value)
+
+
+# Клиенты Jira, общие для экземпляров сервиса: (адрес, токен, размер пула соединений) -> клиент
+_JIRA_CLIENTS: Dict[Tuple[str, str, int], JIRA] = {}
+_JIRA_CLIENTS_LOCK = threading.Lock()
+
+
+def _get_jira_client(url: str, token: str, pool_size: int) -> JIRA:
+    """Возвращает общий клиент Jira, создавая его с пулом keep-alive соединений при первом обращении"""
+    key = (url, token, pool_size)
+    client = _JIRA_CLIENTS.get(key)
+    if client is not None:
+        return client
+    
+    # Конструктор клиента обращается к серверу, поэтому клиент создается вне блокировки
+    client = JIRA(
+        server=url,
+        token_auth=token
+    )
+    
+    # Пул соединений сессии клиента рассчитан на параллельные запросы задач
+    adapter = HTTPAdapter(pool_connections=JiraService.POOL_SIZE, pool_maxsize=pool_size)
+    client._session.mount('https://', adapter)
+    client._session.mount('http://', adapter)
+    client._session.headers['Connection'] = 'keep-alive'
+    
+    with _JIRA_CLIENTS_LOCK:
+        shared_client = _JIRA_CLIENTS.setdefault(key, client)
+    
+    # Другой поток успел создать клиент раньше: используем его, а свой закрываем
+    if shared_client is not client:
+        client.close()
+    return shared_client
+
+
 class JiraService:
+    # Максимальное количество ключей в одном JQL запросе
+    JQL_BATCH_SIZE = 100
+    # Поля задачи, используемые при формировании отчета
+    ISSUE_FIELDS = 'summary,description,status,priority,assignee,customfield_10604,updated'
+    # Количество потоков для получения задач по одной, если пакетный запрос неприменим
+    FETCH_WORKERS = 16
+    # Размер пула соединений, общего для параллельных запросов
+    POOL_SIZE = 16
+    # Размер кэша задач в памяти и время (в секундах), после которого задача сверяется с Jira по полю updated
+    TASK_CACHE_SIZE = 4096
+    TASK_CACHE_TTL = 5 * 60
+    
     def __init__(self, config_service):
         self.config_service = config_service
         
@@ -29,10 +94,14 @@ class JiraService:
         if not all([self.jira_url, self.jira_email, self.jira_token]):
             raise ValueError('Jira configuration is missing')
         
-        self.jira = JIRA(
-            server=self.jira_url,
-            token_auth=self.jira_token
-        )
+        self.max_workers = int(config.get('max_workers') or self.FETCH_WORKERS)
+        # Кэш задач: номер задачи -> (момент проверки актуальности, значение updated, данные задачи)
+        self._task_cache: Dict[str, Tuple[float, Optional[str], Dict[str, Any]]] = {}
+        # Пул потоков для запросов задач по одной создается при первом обращении
+        self._executor: Optional[ThreadPoolExecutor] = None
+        
+        # Клиент Jira с пулом соединений общий для всех экземпляров сервиса с теми же параметрами подключения
+        self.jira = _get_jira_client(self.jira_url, self.jira_token, max(self.POOL_SIZE, self.max_workers))
     
     def get_task_details(self, task_numbers: List[str]) -> List[Dict[str, Any]]:
         """Получает детали задач из Jira одним запросом"""
@@ -43,32 +112,117 @@ class JiraService:
             if not valid_task_numbers:
                 return []
             
-            # Получаем все задачи одним запросом
-            task_details = self._get_tasks_batch_from_jira(valid_task_numbers)
+            # Из Jira запрашиваем только задачи, которых нет в кэше
+            now = time.monotonic()
+            cached = {}
+            stale = []
+            for task_number in dict.fromkeys(valid_task_numbers):
+                entry = self._task_cache.get(task_number)
+                if not entry:
+                    continue
+                if entry[0] > now:
+                    cached[task_number] = entry[2]
+                else:
+                    stale.append(task_number)
+            
+            # Устаревшие записи сверяем по полю updated легким запросом и продлеваем, если задача не менялась
+            if stale:
+                stamps = self._search_issues_in_batches(stale, 'updated')
+                for task_number in stale:
+                    issue = stamps.get(task_number)
+                    _, updated, task_info = self._task_cache[task_number]
+                    if issue is not None and updated and issue.raw['fields'].get('updated') == updated:
+                        self._task_cache[task_number] = (now + self.TASK_CACHE_TTL, updated, task_info)
+                        cached[task_number] = task_info
+            
+            to_fetch = list(dict.fromkeys(number for number in valid_task_numbers if number not in cached))
+            
+            # Получаем все задачи пакетными запросами
+            fetched = {}
+            if to_fetch:
+                issues_by_number = self._fetch_issues(to_fetch)
+                for task_number in to_fetch:
+                    issue = issues_by_number.get(task_number)
+                    if issue is None:
+                        continue
+                    task_info = self._process_task_data(issue, task_number)
+                    if task_info:
+                        fetched[task_number] = task_info
+                        self._cache_task(task_info, issue.raw['fields'].get('updated'), now)
+            
+            # Возвращаем копии, так как задачи дополняются на месте при обогащении
+            task_details = []
+            for task_number in valid_task_numbers:
+                task_info = cached.get(task_number) or fetched.get(task_number)
+                if task_info:
+                    task_details.append(dict(task_info))
             
             return task_details
         except Exception as e:
             raise Exception(f'Error fetching task details from Jira: {str(e)}')
     
-    def _get_tasks_batch_from_jira(self, task_numbers: List[str]) -> List[Dict[str, Any]]:
-        """Получает информацию о нескольких задачах из Jira одним запросом"""
+    def _fetch_issues(self, task_numbers: List[str]) -> Dict[str, Any]:
+        """Получает задачи Jira по номерам: пакетными JQL запросами, остальные по одной параллельно"""
+        # Ключи Jira запрашиваем пакетами через JQL, остальные номера получаем по одному
+        issues_by_number = self._search_issues_in_batches(task_numbers, self.ISSUE_FIELDS)
+        
+        # Не найденные пакетом задачи запрашиваем параллельно
+        missing = [task_number for task_number in task_numbers if task_number not in issues_by_number]
+        if missing:
+            for task_number, issue in zip(missing, self._get_executor().map(self._fetch_issue, missing)):
+                if issue is not None:
+                    issues_by_number[task_number] = issue
+        
+        return issues_by_number
+    
+    def _cache_task(self, task_info: Dict[str, Any], updated: Optional[str], now: float) -> None:
+        """Сохраняет данные задачи в кэш в памяти вместе с отметкой updated"""
+        # Сбрасываем кэш целиком при переполнении, чтобы он не рос бесконечно
+        if len(self._task_cache) >= self.TASK_CACHE_SIZE:
+            self._task_cache.clear()
+        self._task_cache[task_info['task_number']] = (now + self.TASK_CACHE_TTL, updated, dict(task_info))
+    
+    def _get_executor(self) -> ThreadPoolExecutor:
+        """Возвращает пул потоков для запросов задач, общий для всех вызовов сервиса"""
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='jira')
+        return self._executor
+    
+    def _fetch_issue(self, task_number: str):
+        """Получает одну задачу из Jira, при ошибке возвращает None"""
         try:
-            task_details = []
-            for task_number in task_numbers:
-                try:
-                    issue = self.jira.issue(task_number)
-                    task_info = self._process_task_data(issue, task_number)
-                    if task_info:
-                        task_details.append(task_info)
-                except Exception as e:
-                    print(f'Error fetching task {task_number} from Jira: {str(e)}')
-                    continue
-            
-            return task_details
-            
+            return self.jira.issue(task_number, fields=self.ISSUE_FIELDS)
         except Exception as e:
-            print(f'Error fetching tasks batch from Jira: {str(e)}')
-            return []
+            print(f'Error fetching task {task_number} from Jira: {str(e)}')
+            return None
+    
+    def get_issues(self, task_numbers: List[str], fields: str) -> Dict[str, Any]:
+        """Возвращает задачи Jira с указанными полями по номерам; номера, не являющиеся ключами, пропускаются"""
+        return self._search_issues_in_batches(list(dict.fromkeys(task_numbers)), fields)
+    
+    def _search_issues_in_batches(self, task_numbers: List[str], fields: str) -> Dict[str, Any]:
+        """Находит задачи Jira пакетными JQL запросами; номера, не являющиеся ключами, пропускаются"""
+        issues_by_number = {}
+        keys = [task_number for task_number in task_numbers if _ISSUE_KEY_RE.fullmatch(task_number)]
+        for start in range(0, len(keys), self.JQL_BATCH_SIZE):
+            batch = keys[start:start + self.JQL_BATCH_SIZE]
+            try:
+                issues_by_number.update(self._search_issues_by_keys(batch, fields))
+            except Exception as e:
+                print(f'Error searching tasks batch in Jira: {str(e)}')
+        return issues_by_number
+    
+    def _search_issues_by_keys(self, keys: List[str], fields: str) -> Dict[str, Any]:
+        """Находит задачи Jira по списку ключей одним JQL запросом"""
+        jql = f"key in ({','.join(keys)})"
+        # validate_query=False: несуществующие ключи не прерывают весь запрос
+        issues = self.jira.search_issues(
+            jql,
+            fields=fields,
+            maxResults=len(keys),
+            validate_query=False
+        )
+        return {issue.key: issue for issue in issues}
     
     def _process_task_data(self, issue, task_number: str) -> Dict[str, Any]:
         """Обрабатывает данные задачи из Jira в стандартный формат"""
@@ -76,32 +230,34 @@ class JiraService:
             if not task_number:
                 return None
             
+            # Читаем поля из исходного JSON ответа, минуя обертки ресурсов jira
+            fields = issue.raw['fields']
+            
             # Извлекаем значение customfield_10604 (задача интрасервис)
             intraservice_task = None
             intraservice_task_url = None
-            if hasattr(issue.fields, 'customfield_10604') and issue.fields.customfield_10604:
-                intraservice_task = str(issue.fields.customfield_10604)
+            intraservice_value = fields.get('customfield_10604')
+            if intraservice_value:
+                intraservice_task = _readable_value(intraservice_value)
                 intraservice_task_url = f'https://helpdesk.iek.local/Task/View/{intraservice_task}'
             
             # Извлекаем приоритет задачи
             priority_name = 'Средний'  # Значение по умолчанию
-            if hasattr(issue.fields, 'priority') and issue.fields.priority:
-                if hasattr(issue.fields.priority, 'name'):
-                    priority_name = issue.fields.priority.name
-                elif hasattr(issue.fields.priority, 'value'):
-                    priority_name = issue.fields.priority.value
-                else:
-                    priority_name = str(issue.fields.priority)
+            priority = fields.get('priority')
+            if priority:
+                priority_name = priority.get('name') or priority.get('value') or _readable_value(priority)
+            
+            assignee = fields.get('assignee')
             
             # Преобразуем данные Jira в стандартный формат
             task_info = {
                 'task_number': task_number,
-                'title': issue.fields.summary,
-                'summary': issue.fields.summary,
-                'description': issue.fields.description or '',
-                'status': issue.fields.status.name,
+                'title': fields.get('summary'),
+                'summary': fields.get('summary'),
+                'description': fields.get('description') or '',
+                'status': fields['status']['name'],
                 'priority': priority_name,
-                'assignee': issue.fields.assignee.displayName if issue.fields.assignee else 'Unassigned',
+                'assignee': assignee.get('displayName') if assignee else 'Unassigned',
                 'url': f'{self.jira_url}/browse/{task_number}',
                 'intraservice_task': intraservice_task,
                 'intraservice_task_url': intraservice_task_url,
@@ -236,10 +392,14 @@ class JiraService:
     def _link_tasks_to_version(self, task_numbers: List[str], version_id: int) -> None:
         """Связывает задачи с версией релиза"""
         try:
+            # Задачи получаем пакетными запросами без лишних полей, они нужны только для обновления
+            issues_by_number = self._search_issues_in_batches(task_numbers, 'fixVersions')
+            
             for task_number in task_numbers:
                 try:
-                    # Получаем задачу
-                    issue = self.jira.issue(task_number)
+                    issue = issues_by_number.get(task_number)
+                    if issue is None:
+                        issue = self.jira.issue(task_number, fields='fixVersions')
                     
                     # Обновляем поле fixVersions для задачи
                     issue.update(fields={
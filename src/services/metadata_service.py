@@ -1,13 +1,44 @@
-﻿import xml.etree.ElementTree as ET
+﻿import io
+import xml.etree.ElementTree as ET
+from dataclasses import dataclass
 from typing import Dict, List, Any, Tuple
 from .gitlab_service import GitLabService
 from .config_manager import ConfigManager
 import re
 
+# Теги объектов метаданных, изменения которых отслеживаются в Configuration.xml
+_MD_TRACKED_TAGS = frozenset(
+    f'{{http://v8.1c.ru/8.3/MDClasses}}{tag}'
+    for tag in ('Constant', 'Catalog', 'Document', 'InformationRegister', 'AccumulationRegister')
+)
+# Элемент с атрибутами и содержимым и атрибут вида name="value" для разбора невалидного XML
+_TAG_RE = re.compile(r'<(\w+)([^>]*)>(.*?)</\1>', re.DOTALL)
+_ATTR_RE = re.compile(r'(\w+)="([^"]*)"')
+# Признак отсутствия атрибута при сравнении элементов
+_MISSING = object()
+
+
+@dataclass(slots=True, frozen=True)
+class _MDElement:
+    """Разобранный элемент метаданных Configuration.xml"""
+    id: str
+    tag: str
+    attributes: Tuple[Tuple[str, str], ...]
+    text: str
+    children_count: int
+    path: str
+
+
 class MetadataService:
+    # Количество коммитов, для которых хранятся содержимое и разобранные элементы Configuration.xml
+    COMMIT_CACHE_SIZE = 32
+    
     def __init__(self, config_service: ConfigManager):
         self.config_service = config_service
         self.gitlab_service = GitLabService(config_service)
+        # Кэши по идентификатору коммита: содержимое файла и разобранные из него элементы
+        self._file_content_cache: Dict[str, str] = {}
+        self._parsed_elements_cache: Dict[str, Dict[str, _MDElement]] = {}
     
     def analyze_metadata_changes(self, since_commit_date: str = None) -> Dict[str, Any]:
         """
@@ -35,12 +66,12 @@ class MetadataService:
                     'modified_metadata': []
                 }
             
-            # Получаем содержимое файла до и после изменений
-            old_content = self._get_file_content_at_commit(file_changes['since_commit_id'])
-            new_content = self._get_file_content_at_commit(file_changes['current_commit_id'])
+            # Получаем элементы файла до и после изменений
+            old_elements = self._get_elements_at_commit(file_changes['since_commit_id'])
+            new_elements = self._get_elements_at_commit(file_changes['current_commit_id'])
             
             # Анализируем изменения
-            analysis_result = self._analyze_xml_changes(old_content, new_content)
+            analysis_result = self._analyze_xml_changes(old_elements, new_elements)
             
             return {
                 'has_changes': True,
@@ -69,8 +100,29 @@ class MetadataService:
                 'modified_metadata': []
             }
     
+    def _get_elements_at_commit(self, commit_id: str) -> Dict[str, _MDElement]:
+        """Возвращает разобранные элементы Configuration.xml на коммите, разбирая файл один раз"""
+        elements = self._parsed_elements_cache.get(commit_id)
+        if elements is None:
+            content = self._get_file_content_at_commit(commit_id)
+            elements = self._parse_xml_elements(content) if content else {}
+            if commit_id in self._file_content_cache:
+                self._cache_for_commit(self._parsed_elements_cache, commit_id, elements)
+        return elements
+    
+    def _cache_for_commit(self, cache: Dict[str, Any], commit_id: str, value: Any) -> None:
+        """Сохраняет значение в кэш по коммиту, сбрасывая кэш при переполнении"""
+        if len(cache) >= self.COMMIT_CACHE_SIZE:
+            cache.clear()
+        cache[commit_id] = value
+    
     def _get_file_content_at_commit(self, commit_id: str) -> str:
         """Получает содержимое файла Configuration.xml на определенном коммите"""
+        # Содержимое файла на коммите неизменно, поэтому загружаем и декодируем его один раз
+        content = self._file_content_cache.get(commit_id)
+        if content is not None:
+            return content
+        
         try:
             file_data = self.gitlab_service.project.files.get(
                 'src/cf/Configuration.xml', 
@@ -79,21 +131,21 @@ class MetadataService:
             
             import base64
             content = base64.b64decode(file_data.content).decode('utf-8')
+            self._cache_for_commit(self._file_content_cache, commit_id, content)
             return content
             
         except Exception as e:
             if '404' in str(e) or 'not found' in str(e).lower():
+                self._cache_for_commit(self._file_content_cache, commit_id, "")
                 return ""  # Файл не существовал на этом коммите
             print(f'Warning: Error getting file content at commit {commit_id}: {str(e)}')
             return ""  # Возвращаем пустую строку вместо исключения
     
-    def _analyze_xml_changes(self, old_content: str, new_content: str) -> Dict[str, List[Dict]]:
+    def _analyze_xml_changes(self, old_elements: Dict[str, _MDElement],
+                             new_elements: Dict[str, _MDElement]) -> Dict[str, List[Any]]:
         """
-        Анализирует изменения в XML файле и определяет добавленные, удаленные и измененные элементы
+        Сравнивает элементы XML файла и определяет добавленные, удаленные и измененные элементы
         """
-        old_elements = self._parse_xml_elements(old_content) if old_content else {}
-        new_elements = self._parse_xml_elements(new_content) if new_content else {}
-        
         added = []
         removed = []
         modified = []
@@ -104,8 +156,12 @@ class MetadataService:
                 added.append(element_data)
             elif old_elements[element_id] != element_data:
                 # Элемент изменился
+                # Тип, имя и путь измененного элемента берутся из его новой версии
                 modified.append({
                     'id': element_id,
+                    'tag': element_data.tag,
+                    'text': element_data.text,
+                    'path': element_data.path,
                     'old_data': old_elements[element_id],
                     'new_data': element_data,
                     'changes': self._get_element_changes(old_elements[element_id], element_data)
@@ -122,31 +178,35 @@ class MetadataService:
             'modified': modified
         }
     
-    def _parse_xml_elements(self, xml_content: str) -> Dict[str, Dict[str, Any]]:
+    def _parse_xml_elements(self, xml_content: str) -> Dict[str, _MDElement]:
         """
         Парсит XML и извлекает элементы с их атрибутами и содержимым
         """
         elements = {}
         
         try:
-            root = ET.fromstring(xml_content)
-            
-            # Рекурсивно обходим все элементы
-            for element in root.iter():
-                element_id = self._get_element_identifier(element)
-                if element.tag == '{http://v8.1c.ru/8.3/MDClasses}Constant' \
-                or element.tag == '{http://v8.1c.ru/8.3/MDClasses}Catalog' \
-                or element.tag == '{http://v8.1c.ru/8.3/MDClasses}Document' \
-                or element.tag == '{http://v8.1c.ru/8.3/MDClasses}InformationRegister' \
-                or element.tag == '{http://v8.1c.ru/8.3/MDClasses}AccumulationRegister':
-                    elements[element_id] = {
-                        'id': element_id,
-                        'tag': element.tag,
-                        'attributes': element.attrib,
-                        'text': element.text.strip() if element.text else '',
-                        'children_count': len(list(element)),
-                        'path': self._get_element_path(element)
-                    }
+            # Разбираем XML потоково, путь к элементу ведем по стеку открытых тегов
+            path_parts = []
+            for event, element in ET.iterparse(io.BytesIO(xml_content.encode('utf-8')), events=('start', 'end')):
+                if event == 'start':
+                    path_parts.append(element.tag)
+                    continue
+                
+                if element.tag in _MD_TRACKED_TAGS:
+                    path = '/'.join(path_parts)
+                    element_id = self._get_element_identifier(element, path)
+                    elements[element_id] = _MDElement(
+                        id=element_id,
+                        tag=element.tag,
+                        attributes=tuple(sorted(element.attrib.items())),
+                        text=element.text.strip() if element.text else '',
+                        children_count=len(element),
+                        path=path
+                    )
+                
+                # Обработанный элемент больше не нужен, освобождаем его содержимое
+                path_parts.pop()
+                element.clear()
         
         except ET.ParseError as e:
             print(f'Error parsing XML: {str(e)}')
@@ -155,7 +215,7 @@ class MetadataService:
         
         return elements
     
-    def _get_element_identifier(self, element) -> str:
+    def _get_element_identifier(self, element, path: str) -> str:
         """
         Создает уникальный идентификатор для элемента на основе его атрибутов и пути
         """
@@ -168,35 +228,21 @@ class MetadataService:
             return f"{element.tag}@{element.attrib['type']}"
         else:
             # Используем путь и текст для идентификации
-            path = self._get_element_path(element)
             text = element.text.strip() if element.text else ''
             return f"{path}#{text[:50]}" if text else path
     
-    def _get_element_path(self, element) -> str:
-        """Получает путь к элементу в XML"""
-        path_parts = []
-        current = element
-        while current is not None:
-            path_parts.insert(0, current.tag)
-            current = current.getparent() if hasattr(current, 'getparent') else None
-        return '/'.join(path_parts)
-    
-    def _parse_xml_with_regex(self, xml_content: str) -> Dict[str, Dict[str, Any]]:
+    def _parse_xml_with_regex(self, xml_content: str) -> Dict[str, _MDElement]:
         """
         Альтернативный метод парсинга XML через регулярные выражения
         для случаев, когда XML невалидный
         """
         elements = {}
         
-        # Паттерны для поиска элементов
-        tag_pattern = r'<(\w+)([^>]*)>(.*?)</\1>'
-        attr_pattern = r'(\w+)="([^"]*)"'
-        
-        matches = re.findall(tag_pattern, xml_content, re.DOTALL)
+        matches = _TAG_RE.findall(xml_content)
         
         for i, (tag, attrs_str, content) in enumerate(matches):
             # Парсим атрибуты
-            attrs = dict(re.findall(attr_pattern, attrs_str))
+            attrs = dict(_ATTR_RE.findall(attrs_str))
             
             element_id = f"{tag}@{i}"
             if 'id' in attrs:
@@ -204,40 +250,42 @@ class MetadataService:
             elif 'name' in attrs:
                 element_id = f"{tag}@{attrs['name']}"
             
-            elements[element_id] = {
-                'id': element_id,
-                'tag': tag,
-                'attributes': attrs,
-                'text': content.strip(),
-                'children_count': 0,
-                'path': tag
-            }
+            elements[element_id] = _MDElement(
+                id=element_id,
+                tag=tag,
+                attributes=tuple(sorted(attrs.items())),
+                text=content.strip(),
+                children_count=0,
+                path=tag
+            )
         
         return elements
     
-    def _get_element_changes(self, old_data: Dict, new_data: Dict) -> List[str]:
+    def _get_element_changes(self, old_data: _MDElement, new_data: _MDElement) -> List[str]:
         """Определяет конкретные изменения в элементе"""
         changes = []
         
         # Сравниваем атрибуты
-        old_attrs = old_data.get('attributes', {})
-        new_attrs = new_data.get('attributes', {})
+        old_attrs = dict(old_data.attributes)
+        new_attrs = dict(new_data.attributes)
         
-        for key in set(old_attrs.keys()) | set(new_attrs.keys()):
-            old_val = old_attrs.get(key, '')
-            new_val = new_attrs.get(key, '')
+        for key in old_attrs.keys() | new_attrs.keys():
+            old_val = old_attrs.get(key, _MISSING)
+            new_val = new_attrs.get(key, _MISSING)
             
-            if old_val != new_val:
-                if key not in old_attrs:
+            # Отсутствующий атрибут равнозначен пустому значению
+            if old_val is _MISSING:
+                if new_val != '':
                     changes.append(f"Добавлен атрибут {key}='{new_val}'")
-                elif key not in new_attrs:
+            elif new_val is _MISSING:
+                if old_val != '':
                     changes.append(f"Удален атрибут {key}='{old_val}'")
-                else:
-                    changes.append(f"Изменен атрибут {key}: '{old_val}'  '{new_val}'")
+            elif old_val != new_val:
+                changes.append(f"Изменен атрибут {key}: '{old_val}'  '{new_val}'")
         
         # Сравниваем текст
-        old_text = old_data.get('text', '')
-        new_text = new_data.get('text', '')
+        old_text = old_data.text
+        new_text = new_data.text
         
         if old_text != new_text:
             changes.append(f"Изменен текст: '{old_text[:100]}...'  '{new_text[:100]}...'")
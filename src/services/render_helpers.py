@@ -0,0 +1,23 @@
+"""
+Общие функции генераторов отчетов
+"""
+from typing import List, Optional, Tuple
+
+# Таблица экранирования HTML для str.translate (один проход по строке)
+HTML_ESCAPE = str.maketrans({'&': '&amp;', '<': '&lt;', '>': '&gt;', '"': '&quot;'})
+
+
+def escape_html(value) -> str:
+    """Экранирует пользовательское значение для вставки в HTML"""
+    return str(value).translate(HTML_ESCAPE)
+
+
+def metadata_element_fields(element) -> Tuple[str, str, str, Optional[List[str]]]:
+    """Возвращает тег, текст, путь и изменения элемента метаданных (словаря или объекта)"""
+    if isinstance(element, dict):
+        # Измененный элемент без собственных полей описывается своей новой версией
+        if 'tag' not in element and element.get('new_data') is not None:
+            tag, text, path, _ = metadata_element_fields(element['new_data'])
+            return tag, text, path, element.get('changes')
+        return element.get('tag', ''), element.get('text', ''), element.get('path', ''), element.get('changes')
+    return element.tag, getattr(element, 'text', ''), getattr(element, 'path', ''), getattr(element, 'changes', None)
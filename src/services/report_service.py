@@ -164,7 +164,7 @@ class ReportService(BaseService):
             if not report_data['has_data']:
                 return self.html_generator.generate_empty_report(report_data['message'])
             
-            # Генерируем HTML
+            # Страница собирается целиком до ответа: ошибка при отрисовке возвращает страницу ошибки
             return self.html_generator.generate(
                 commits=report_data['commits'],
                 tasks=report_data['tasks'],
@@ -1,7 +1,7 @@
 """
 Валидаторы для системы отчетов
 """
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Union
 from .base import ValidationError, CommitData, TaskData, MetadataChanges
 from .constants import MESSAGES
 
@@ -34,13 +34,18 @@ class DataValidator:
         return validated_commits
     
     @staticmethod
-    def validate_task_data(tasks: List[Dict[str, Any]]) -> List[TaskData]:
+    def validate_task_data(tasks: List[Union[Dict[str, Any], TaskData]]) -> List[TaskData]:
         """Валидирует и преобразует данные задач"""
         if not isinstance(tasks, list):
             raise ValidationError("Tasks must be a list")
         
         validated_tasks = []
         for i, task in enumerate(tasks):
+            # Уже проверенные задачи повторно не валидируем
+            if isinstance(task, TaskData):
+                validated_tasks.append(task)
+                continue
+            
             try:
                 validated_task = TaskData(
                     task_number=DataValidator._validate_string(task.get('task_number'), f"task[{i}].task_number"),
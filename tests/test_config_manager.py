@@ -0,0 +1,76 @@
+"""
+Тесты отслеживания изменений и перезагрузки конфигурации
+"""
+import json
+import os
+import tempfile
+import unittest
+from pathlib import Path
+
+from src.services.base import ConfigurationError
+from src.services.config_manager import ConfigManager
+
+_GITLAB_CONFIG = {'gitlab': {'url': 'https://gitlab.example', 'group': 'group', 'project': 'project'}}
+
+
+class ConfigReloadTest(unittest.TestCase):
+
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.config_dir = Path(self._tmp.name)
+        self._write('app.json', {'app': {'commits_file': 'commits'}})
+        self._write('gitlab.json', _GITLAB_CONFIG)
+        self.manager = ConfigManager(str(self.config_dir))
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def _write(self, filename, data):
+        """Записывает файл конфигурации и сдвигает его mtime, чтобы изменение было заметно сразу"""
+        path = self.config_dir / filename
+        previous_mtime = path.stat().st_mtime_ns if path.exists() else 0
+        path.write_text(json.dumps(data), encoding='utf-8')
+        os.utime(path, ns=(previous_mtime + 10 ** 9, previous_mtime + 10 ** 9))
+
+    def test_not_stale_after_load(self):
+        self.manager.get_all_config()
+
+        self.assertFalse(self.manager.is_stale())
+
+    def test_stale_after_file_change(self):
+        self.manager.get_all_config()
+        self._write('app.json', {'app': {'commits_file': 'other'}})
+
+        self.assertTrue(self.manager.is_stale())
+
+    def test_unloaded_file_is_not_tracked(self):
+        # Файл, к которому еще не обращались, будет прочитан при первом обращении и не делает конфигурацию устаревшей
+        self.manager.get_app_config()
+        self._write('gitlab.json', {'gitlab': dict(_GITLAB_CONFIG['gitlab'], project='other')})
+
+        self.assertFalse(self.manager.is_stale())
+        self.assertEqual(self.manager.get_gitlab_config()['project'], 'other')
+
+    def test_reload_reads_changed_file(self):
+        self.manager.get_all_config()
+        self._write('app.json', {'app': {'commits_file': 'other'}})
+
+        self.manager.reload_config()
+
+        self.assertFalse(self.manager.is_stale())
+        self.assertEqual(self.manager.get_app_config(), {'commits_file': 'other'})
+        self.assertEqual(self.manager.get_gitlab_config()['project'], 'project')
+
+    def test_failed_reload_keeps_previous_config(self):
+        self.manager.get_all_config()
+        self._write('gitlab.json', {'gitlab': {'url': 'https://gitlab.example'}})
+
+        with self.assertRaises(ConfigurationError):
+            self.manager.reload_config()
+
+        self.assertTrue(self.manager.is_stale())
+        self.assertEqual(self.manager.get_gitlab_config()['project'], 'project')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,53 @@
+"""
+Тесты поиска ссылок на Confluence в тексте задач
+"""
+import re
+import unittest
+
+from src.services.constants import CONFLUENCE_URL_RE
+
+
+def _find_urls_with_trim(text):
+    """Прежний поиск: все ссылки на Confluence с последующей обрезкой до pageId=число"""
+    urls = []
+    for url in re.findall(r'https?://[^/]*confluence[^/]*/[^\s<>"\']*', text):
+        pageid_match = re.search(r'(pageId=\d+)', url)
+        if pageid_match:
+            url = url[:url.find(pageid_match.group(1)) + len(pageid_match.group(1))]
+        urls.append(url)
+    return urls
+
+
+class ConfluenceUrlPatternTest(unittest.TestCase):
+
+    SAMPLES = (
+        'См. https://confluence.example.com/pages/viewpage.action?pageId=12345',
+        'https://confluence.example.com/pages/viewpage.action?pageId=12345&focusedCommentId=7#comment',
+        'http://wiki-confluence.local/display/SPACE/Page+Title и далее текст',
+        '<a href="https://confluence.example.com/x/AbCd">страница</a>',
+        "'https://confluence.example.com/pages/viewpage.action?pageId=1'",
+        'https://confluence.example.com/display/SPACE/Page?src=contextnavpagetreemode',
+        'две ссылки: https://confluence.a/pages/viewpage.action?pageId=1, https://confluence.b/display/X/Y',
+        'https://confluence.example.com/pages/viewpage.action?spaceKey=S&pageId=99&preview=true',
+        'https://gitlab.example.com/group/project и https://jira.example.com/browse/AB-1',
+        'в конце строки https://confluence.example.com/display/SPACE/Page',
+        'https://confluence.example.com/',
+        '',
+    )
+
+    def test_matches_findall_with_trim(self):
+        for text in self.SAMPLES:
+            with self.subTest(text=text):
+                self.assertEqual(CONFLUENCE_URL_RE.findall(text), _find_urls_with_trim(text))
+
+    def test_trims_to_page_id(self):
+        text = 'https://confluence.example.com/pages/viewpage.action?pageId=42&src=mail'
+
+        self.assertEqual(
+            CONFLUENCE_URL_RE.findall(text),
+            ['https://confluence.example.com/pages/viewpage.action?pageId=42']
+        )
+
+
+if __name__ == '__main__':
+    unittest.main()
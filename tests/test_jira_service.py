@@ -0,0 +1,96 @@
+"""
+Тесты кэша задач JiraService
+"""
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+from src.services.jira_service import JiraService
+
+
+class _FakeJira:
+    """Клиент Jira, отдающий задачи из словаря и записывающий запросы"""
+
+    def __init__(self):
+        self.updated = {}
+        self.summaries = {}
+        self.searches = []
+
+    def add_issue(self, key, summary, updated):
+        self.summaries[key] = summary
+        self.updated[key] = updated
+
+    def _issue(self, key):
+        return SimpleNamespace(key=key, raw={'fields': {
+            'summary': self.summaries[key],
+            'status': {'name': 'Done'},
+            'priority': {'name': 'High'},
+            'assignee': None,
+            'updated': self.updated[key],
+        }})
+
+    def search_issues(self, jql, fields, maxResults, validate_query):
+        self.searches.append(fields)
+        keys = jql[len('key in ('):-1].split(',')
+        return [self._issue(key) for key in keys if key in self.summaries]
+
+    def issue(self, key, fields):
+        return self._issue(key)
+
+
+class TaskCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.jira = _FakeJira()
+        self.jira.add_issue('AB-1', 'Первая', '2024-01-01T10:00')
+        tracker_config = SimpleNamespace(
+            config={'url': 'https://jira.example', 'email': 'user@example', 'api_token': 'token'},
+            enabled=True
+        )
+        with mock.patch('src.services.jira_service._get_jira_client', return_value=self.jira):
+            self.service = JiraService(tracker_config)
+
+    def _expire_cache(self):
+        """Помечает все записи кэша как требующие сверки с Jira"""
+        for task_number, (_, updated, task_info) in self.service._task_cache.items():
+            self.service._task_cache[task_number] = (0, updated, task_info)
+
+    def test_fresh_entry_served_from_cache(self):
+        self.service.get_task_details(['AB-1'])
+        self.jira.searches.clear()
+
+        tasks = self.service.get_task_details(['AB-1'])
+
+        self.assertEqual([task['title'] for task in tasks], ['Первая'])
+        self.assertEqual(self.jira.searches, [])
+
+    def test_unchanged_issue_revalidated_by_updated(self):
+        self.service.get_task_details(['AB-1'])
+        self._expire_cache()
+        self.jira.searches.clear()
+
+        tasks = self.service.get_task_details(['AB-1'])
+
+        self.assertEqual([task['title'] for task in tasks], ['Первая'])
+        self.assertEqual(self.jira.searches, ['updated'])
+
+    def test_changed_issue_fetched_again(self):
+        self.service.get_task_details(['AB-1'])
+        self._expire_cache()
+        self.jira.add_issue('AB-1', 'Переименована', '2024-01-02T10:00')
+        self.jira.searches.clear()
+
+        tasks = self.service.get_task_details(['AB-1'])
+
+        self.assertEqual([task['title'] for task in tasks], ['Переименована'])
+        self.assertEqual(self.jira.searches, ['updated', JiraService.ISSUE_FIELDS])
+
+    def test_returned_tasks_do_not_change_cache(self):
+        tasks = self.service.get_task_details(['AB-1'])
+        tasks[0]['title'] = 'Изменено при обогащении'
+
+        self.assertEqual(self.service.get_task_details(['AB-1'])[0]['title'], 'Первая')
+
+
+if __name__ == '__main__':
+    unittest.main()
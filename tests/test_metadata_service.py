@@ -0,0 +1,65 @@
+"""
+Тесты сравнения метаданных Configuration.xml
+"""
+import unittest
+
+from src.services.metadata_service import MetadataService
+
+_MD_NS = 'http://v8.1c.ru/8.3/MDClasses'
+_OLD_XML = (
+    f'<MetaDataObject xmlns="{_MD_NS}">'
+    '<Document name="Order" version="1"/><Document name="Invoice"/><Catalog>Items</Catalog>'
+    '</MetaDataObject>'
+)
+_NEW_XML = (
+    f'<MetaDataObject xmlns="{_MD_NS}">'
+    '<Document name="Order" version="2"/><Document name="Invoice"/><Constant>Rate</Constant>'
+    '</MetaDataObject>'
+)
+
+
+def _tag(name: str) -> str:
+    """Возвращает полное имя тега в пространстве имен метаданных"""
+    return f'{{{_MD_NS}}}{name}'
+
+
+class AnalyzeXmlChangesTest(unittest.TestCase):
+
+    def setUp(self):
+        self.service = MetadataService.__new__(MetadataService)
+        self.result = self.service._analyze_xml_changes(
+            self.service._parse_xml_elements(_OLD_XML),
+            self.service._parse_xml_elements(_NEW_XML)
+        )
+
+    def test_added_elements(self):
+        added = self.result['added']
+
+        self.assertEqual([(element.tag, element.text) for element in added], [(_tag('Constant'), 'Rate')])
+        self.assertEqual(added[0].path, f"{_tag('MetaDataObject')}/{_tag('Constant')}")
+
+    def test_removed_elements(self):
+        removed = self.result['removed']
+
+        self.assertEqual([(element.tag, element.text) for element in removed], [(_tag('Catalog'), 'Items')])
+
+    def test_modified_elements(self):
+        modified = self.result['modified']
+
+        self.assertEqual(len(modified), 1)
+        entry = modified[0]
+        self.assertEqual(entry['tag'], _tag('Document'))
+        self.assertEqual(entry['path'], f"{_tag('MetaDataObject')}/{_tag('Document')}")
+        self.assertEqual(dict(entry['old_data'].attributes)['version'], '1')
+        self.assertEqual(dict(entry['new_data'].attributes)['version'], '2')
+        self.assertEqual(entry['changes'], ["Изменен атрибут version: '1'  '2'"])
+
+    def test_no_changes_for_same_content(self):
+        elements = self.service._parse_xml_elements(_OLD_XML)
+        result = self.service._analyze_xml_changes(elements, self.service._parse_xml_elements(_OLD_XML))
+
+        self.assertEqual(result, {'added': [], 'removed': [], 'modified': []})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,55 @@
+"""
+Тесты генераторов HTML и Confluence отчетов
+"""
+import unittest
+
+from src.services.base import MetadataChanges
+from src.services.confluence_generator import ConfluenceReportGenerator
+from src.services.html_generator import HTMLReportGenerator
+from src.services.metadata_service import MetadataService
+
+_MD_NS = 'http://v8.1c.ru/8.3/MDClasses'
+_OLD_XML = f'<MetaDataObject xmlns="{_MD_NS}"><Document name="Order" version="1"/><Catalog>Items</Catalog></MetaDataObject>'
+_NEW_XML = f'<MetaDataObject xmlns="{_MD_NS}"><Document name="Order" version="2"/><Constant>Rate</Constant></MetaDataObject>'
+
+
+def _make_metadata_changes() -> MetadataChanges:
+    """Строит изменения метаданных с добавленным, удаленным и измененным элементами"""
+    service = MetadataService.__new__(MetadataService)
+    result = service._analyze_xml_changes(
+        service._parse_xml_elements(_OLD_XML),
+        service._parse_xml_elements(_NEW_XML)
+    )
+    return MetadataChanges(
+        has_changes=True,
+        added_metadata=result['added'],
+        removed_metadata=result['removed'],
+        modified_metadata=result['modified'],
+        summary={
+            'total_added': len(result['added']),
+            'total_removed': len(result['removed']),
+            'total_modified': len(result['modified'])
+        }
+    )
+
+
+class MetadataRenderingTest(unittest.TestCase):
+
+    def test_html_report_renders_modified_element(self):
+        html = HTMLReportGenerator().generate([], [], _make_metadata_changes())
+
+        self.assertIn('Измененные элементы', html)
+        self.assertIn("Изменен атрибут version: '1'  '2'", html)
+        self.assertIn('Документ', html)
+
+    def test_confluence_report_renders_modified_element(self):
+        generator = ConfluenceReportGenerator('https://gitlab.example', 'group', 'project')
+        html = generator.generate([], [], _make_metadata_changes())
+
+        self.assertIn('Измененные элементы', html)
+        self.assertIn("Изменен атрибут version: '1'  '2'", html)
+        self.assertIn('Документ', html)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,53 @@
+"""
+Тесты формирования предварительного просмотра отчета
+"""
+import asyncio
+import logging
+import unittest
+
+from src.services.base import CommitData
+from src.services.html_generator import HTMLReportGenerator
+from src.services.report_service import ReportService
+
+
+class _StubDataManager:
+    """Менеджер данных, возвращающий заранее заданные данные отчета"""
+
+    def __init__(self, commits):
+        self.commits = commits
+
+    def get_last_commit(self):
+        return None
+
+    def get_report_data_with_date_filter(self, last_commit, report_dt):
+        return {'has_data': True, 'commits': self.commits, 'tasks': [], 'metadata': None}
+
+
+def _make_service(commits) -> ReportService:
+    """Создает сервис отчетов без подключения к внешним системам"""
+    service = ReportService.__new__(ReportService)
+    service.logger = logging.getLogger(__name__)
+    service.data_manager = _StubDataManager(commits)
+    service.html_generator = HTMLReportGenerator()
+    return service
+
+
+class PreviewReportWithDateTest(unittest.TestCase):
+
+    def test_returns_full_report(self):
+        commit = CommitData(id='0123456789abcdef', message='AB-1 fix', author='dev', date='2024-01-01T00:00:00')
+        result = asyncio.run(_make_service([commit]).generate_preview_report_with_date('2024-01-02'))
+
+        self.assertIn('01234567', result)
+        self.assertTrue(result.rstrip().endswith('</html>'))
+
+    def test_render_error_returns_error_page(self):
+        # Ошибка при отрисовке фрагмента коммита должна давать страницу ошибки, а не оборванный отчет
+        commit = CommitData(id=None, message='AB-1 fix', author='dev', date='2024-01-01T00:00:00')
+        result = asyncio.run(_make_service([commit]).generate_preview_report_with_date('2024-01-02'))
+
+        self.assertIn('Ошибка при формировании отчета', result)
+
+
+if __name__ == '__main__':
+    unittest.main()